@@ -1,15 +1,1256 @@
 import re
+import os
+import sys
 import json
+import mmap
+import codecs
+import struct
+from functools import lru_cache, partial
+from itertools import repeat
+from operator import contains, itemgetter, mul
+from time import perf_counter_ns
+from typing import NamedTuple
 from CharacterMap import CharacterMap
 
 # assume that line length will be at most 44 characters
 MAX_MRZ_LENGTH=44
 
-class MachineReadableTravelDocument:
+# fields expected in each line of the decoded MRZ payload, in validation order
+LINE_1_FIELDS = ('issuing_country', 'last_name', 'given_name')
+LINE_2_FIELDS = ('passport_number', 'country_code', 'birth_date', 'sex', 'expiration_date', 'personal_number')
+LINE_1_KEYS = frozenset(LINE_1_FIELDS)
+LINE_2_KEYS = frozenset(LINE_2_FIELDS)
+
+ILLEGAL_CHARACTER_MESSAGE = 'The provided character {} does not conform to the ICAO standard alpha-numeric character values. \
+                    The MRZ for this Travel Document is invalid.'
+
+# the character map is shared by every MachineReadableTravelDocument instead of rebuilt per instance
+CHARACTER_MAP = CharacterMap().character_map
+ICAO_CHARACTERS = ''.join(CHARACTER_MAP).encode('ascii')
+
+# check digit engine tables, built once at import: a 256-entry byte -> character value table
+# (bytes outside the ICAO alphabet map to INVALID_VALUE) and the repeating 7/3/1 weight
+# sequences for the fixed field lengths; other lengths use the longer GENERIC_WEIGHTS
+INVALID_VALUE = 0xFF
+CHARACTER_VALUES = bytes(CHARACTER_MAP.get(chr(code), INVALID_VALUE) for code in range(256))
+FIELD_WEIGHTS = {
+    6: (7, 3, 1) * 2,
+    9: (7, 3, 1) * 3
+}
+GENERIC_WEIGHTS = (7, 3, 1) * 30
+
+"""
+helper function to compute the check digit of a field with the precomputed tables
+"""
+def compute_check_digit(field: str) -> int:
+    values = field.encode('ascii', 'replace').translate(CHARACTER_VALUES)
+    if INVALID_VALUE in values:
+        raise Exception(ILLEGAL_CHARACTER_MESSAGE.format(next(val for val in field if val not in CHARACTER_MAP)))
+    weights = FIELD_WEIGHTS.get(len(values))
+    if weights is None:
+        weights = GENERIC_WEIGHTS if len(values) <= len(GENERIC_WEIGHTS) else (7, 3, 1) * (len(values) // 3 + 1)
+    return sum(map(mul, values, weights)) % 10
+
+# batch check digit tables: every byte maps to (value * weight) % 10 for one of the
+# repeating 7/3/1 weights, so a whole column of characters is weighted by bytes.translate
+def _weighted_table(weight: int) -> bytes:
+    table = bytearray(256)
+    for character, value in CHARACTER_MAP.items():
+        table[ord(character)] = value * weight % 10
+    return bytes(table)
+
+WEIGHTED_TABLES = (_weighted_table(7), _weighted_table(3), _weighted_table(1))
+MOD_10_TABLE = bytes(total % 10 for total in range(256))
+CHECK_DIGIT_CHARACTERS = bytes(ord('0') + total % 10 for total in range(256))
+# each weighted position adds at most 9 to a one-byte lane and a reduced lane holds at most 9,
+# so reducing every 27 positions keeps lanes at or below 9 + 27 * 9 = 252
+LANE_POSITIONS = 27
+
+"""
+helper function to generate the check digits of many fields at once; the fields are
+packed into one buffer and each character position is weighted for all records together,
+summing the weighted columns as one-byte lanes of a single integer
+@return string holding one check digit character per field
+"""
+def generate_check_digits(fields: list) -> str:
+    if not fields:
+        return ""
+    width = max(map(len, fields))
+    # '<' has the value 0, so right padding with filler leaves every check digit unchanged
+    joined = ''.join(map(str.ljust, fields, repeat(width), repeat('<')))
+    if not joined.isascii():
+        raise Exception(ILLEGAL_CHARACTER_MESSAGE.format(next(val for val in joined if not val.isascii())))
+    packed = joined.encode('ascii')
+    illegal = packed.translate(None, ICAO_CHARACTERS)
+    if illegal:
+        raise Exception(ILLEGAL_CHARACTER_MESSAGE.format(chr(illegal[0])))
+
+    return check_digit_column(packed, width, len(fields)).decode('ascii')
+
+"""
+helper function to generate the check digits of a packed fixed-width column holding count
+fields of width bytes each; bytes outside the ICAO alphabet weigh 0 and are not reported here
+@return bytes holding one ASCII check digit per field
+"""
+def check_digit_column(packed: bytes, width: int, count: int) -> bytes:
+    total = 0
+    for position in range(width):
+        column = packed[position::width].translate(WEIGHTED_TABLES[position % 3])
+        total += int.from_bytes(column, 'little')
+        if position % LANE_POSITIONS == LANE_POSITIONS - 1:
+            total = int.from_bytes(total.to_bytes(count, 'little').translate(MOD_10_TABLE), 'little')
+    return total.to_bytes(count, 'little').translate(CHECK_DIGIT_CHARACTERS)
+
+# layout spec roles: header fields (and the names) are always decoded, data fields only when
+# every check digit of the record matches; optional data fields may be left empty, read up
+# to their first '<' and accept '<' as their check digit
+HEADER_FIELD = "header"
+NAMES_FIELD = "names"
+DATA_FIELD = "data"
+OPTIONAL_FIELD = "optional"
+COMPOSITE = "composite"
+
+# TD3 names the passport number check digit after the passport; every other check digit is
+# named after its field
+CHECK_DIGIT_NAMES = {"passport_number": "passport_check_digit"}
+FILLER = ord('<')
+
+"""
+helper function to name the check digit of a field, in regex groups and decoded columns
+"""
+def check_digit_name(field: str) -> str:
+    return CHECK_DIGIT_NAMES.get(field, field + "_check_digit")
+
+"""
+helper function to copy the bytes at the given record positions out of every packed record
+into one row-major column, with one strided slice per position
+"""
+def _gather_column(buffer, count: int, record_length: int, positions: tuple) -> bytes:
+    width = len(positions)
+    column = bytearray(count * width)
+    for index, position in enumerate(positions):
+        column[index::width] = buffer[position::record_length]
+    return bytes(column)
+
+class MRZLayout:
+    """
+    declarative MRZ document layout compiled once into slice tables, a structural regex, an
+    empty record template to encode over and the record positions covered by each check digit
+    @param fields: (field, line, offset, width, role) in any order
+    @param check_digits: (field or COMPOSITE, line, offset, spans) where spans holds the
+    (line, offset, width) ranges the digit covers, concatenated in order
+    Decoded dicts and encode payloads use the TD3 shape for every layout: header fields,
+    last_name and given_name under "line1" and data fields under "line2".
+    """
+    def __init__(self, name: str, line_length: int, line_count: int, document_type: str, fields: tuple, check_digits: tuple):
+        self.name = name
+        self.line_length = line_length
+        self.line_count = line_count
+        self.document_type = document_type
+        self.record_length = line_count * line_length + line_count - 1
+        self.fields = fields
+        self.check_digits = check_digits
+
+        position = lambda line, offset: line * (line_length + 1) + offset
+        self._slices = tuple((field, slice(position(line, offset), position(line, offset) + width), width, role)
+                             for field, line, offset, width, role in fields)
+        roles = {field: role for field, _, _, _, role in fields}
+        # (name, check digit position, covered positions, accepts '<')
+        self._checks = tuple(
+            (field, position(line, offset),
+             tuple(position(span_line, span_offset) + index for span_line, span_offset, width in spans for index in range(width)),
+             roles.get(field) == OPTIONAL_FIELD)
+            for field, line, offset, spans in check_digits
+        )
+        # (field, record slice, check digit position or None) of every field in record order; the one
+        # offset table for code working on the record positions of this layout
+        check_positions = {field: check_position for field, check_position, _, _ in self._checks}
+        self.field_positions = tuple(sorted(
+            ((field, field_slice, check_positions.get(field)) for field, field_slice, _, _ in self._slices),
+            key=lambda entry: entry[1].start
+        ))
+
+        self.widths = {field: width for field, _, width, _ in self._slices}
+        self.optional_fields = frozenset(field for field, _, _, role in self._slices if role == OPTIONAL_FIELD)
+
+        # structural regex with one named group per field and check digit, in record order; the
+        # encode template is an empty record, the separators and '<' filler every field overwrites
+        parts = {}
+        template = bytearray(b'<' * self.record_length)
+        for line in range(1, line_count):
+            parts[position(line, 0) - 1] = (';', 1)
+            template[position(line, 0) - 1] = ord(';')
+        for field, check_position, _, optional in self._checks:
+            digit = r'[\d<]' if optional else r'\d'
+            parts[check_position] = (digit if field == COMPOSITE else '(?P<{}>{})'.format(check_digit_name(field), digit), 1)
+        for field, field_slice, width, _ in self._slices:
+            parts[field_slice.start] = ('(?P<{}>.{{{}}})'.format(field, width), width)
+        pattern = []
+        index = 0
+        while index < self.record_length:
+            part, width = parts.get(index, ('.', 1))
+            pattern.append(part)
+            index += width
+        self.pattern = re.compile(''.join(pattern))
+        self.template = bytes(template)
+
+    def __repr__(self) -> str:
+        return "MRZLayout({!r})".format(self.name)
+
+    """
+    Method to decode many records of this layout; each check digit is verified for the whole
+    batch at once with the packed column check digit engine
+    """
+    def decode_many(self, encoded_mrzs) -> list:
+        encoded_mrzs = list(encoded_mrzs)
+        for encoded_mrz in encoded_mrzs:
+            if self.pattern.fullmatch(encoded_mrz) is None:
+                raise Exception("The MRZ input provided cannot be parsed because it does not match the fixed {} layout: {}".format(self.name, encoded_mrz))
+        count = len(encoded_mrzs)
+        if count == 0:
+            return []
+        buffer = ''.join(encoded_mrzs).encode('ascii', 'replace')
+        failed = 0
+        for _, check_position, positions, optional in self._checks:
+            column = _gather_column(buffer, count, self.record_length, positions)
+            actual = buffer[check_position::self.record_length]
+            if optional:
+                actual = actual.replace(b'<', b'0')
+            width = len(positions)
+            failed |= _mismatch_lanes(check_digit_column(column, width, count), actual, count)
+            if column.translate(None, ICAO_CHARACTERS):
+                illegal = column.translate(ICAO_CHARACTER_FLAGS)
+                for index in range(width):
+                    failed |= int.from_bytes(illegal[index::width], 'little')
+        return list(map(self._decode_fields, encoded_mrzs, failed.to_bytes(count, 'little')))
+
+    def decode(self, encoded_mrz: str) -> dict:
+        return self.decode_many([encoded_mrz])[0]
+
+    """
+    helper function to slice one record into the decoded dict, leaving out the data fields
+    when failed is set
+    """
+    def _decode_fields(self, encoded_mrz: str, failed: int) -> dict:
+        decoded_mrz = {}
+        for field, field_slice, _, role in self._slices:
+            value = encoded_mrz[field_slice]
+            if role == NAMES_FIELD:
+                last_name, _, given_names = value.partition('<<')
+                decoded_mrz["last_name"] = last_name
+                decoded_mrz["given_name"] = ' '.join(given_names.split('<')[:2]).strip()
+            elif role == HEADER_FIELD:
+                decoded_mrz[field] = value.rstrip('<') if field == "document_type" else value
+            elif not failed:
+                decoded_mrz[field] = value.partition('<')[0] if role == OPTIONAL_FIELD else value
+        return decoded_mrz
+
+    """
+    Method to encode many payloads into records of this layout; every field is validated and
+    packed as one column for the whole batch, check digits are generated per column and the
+    records are assembled into one buffer, the composite check digits last since they cover
+    the other check digits
+    @param observe: callable taking a stage name ("validation", "check_digits", "assembly")
+    and its perf_counter_ns start, returning the start of the next stage
+    @param strict: require every field in the payload, optional ones included, as
+    encode_mrz_input does; otherwise a missing optional field is left empty
+    """
+    def encode_many(self, decoded_mrzs, observe=None, strict: bool = False) -> list:
+        decoded_mrzs = list(decoded_mrzs)
+        if any(map(isinstance, decoded_mrzs, repeat(MRZRecord))):
+            decoded_mrzs = [
+                decoded_mrz.to_encode_dict() if isinstance(decoded_mrz, MRZRecord) else decoded_mrz
+                for decoded_mrz in decoded_mrzs
+            ]
+        count = len(decoded_mrzs)
+        if count == 0:
+            return []
+        if observe is not None:
+            started = perf_counter_ns()
+        try:
+            lines = (list(map(itemgetter('line1'), decoded_mrzs)), list(map(itemgetter('line2'), decoded_mrzs)))
+        except KeyError:
+            raise KeyError('The decoded MRZ data provided does not contain the key-value pairs expected. Aborting operation.')
+        exception_string = 'The expected field \'{}\' was not found in line {} of the decoded MRZ Input. Aborting operation.'
+
+        # one list per field; fetching the existing strings allocates no per-record containers
+        values = {}
+        empty = {}
+        for field, _, _, role in self._slices:
+            line_index = 1 if role in (DATA_FIELD, OPTIONAL_FIELD) else 0
+            for name in (("last_name", "given_name") if role == NAMES_FIELD else (field,)):
+                default = self.document_type if name == "document_type" else None
+                column = list(map(dict.get, lines[line_index], repeat(name), repeat(default)))
+                # all() only walks the strings, the None lookup is left for batches holding an empty value
+                if not all(column) and None in column:
+                    if role != OPTIONAL_FIELD or (strict and not all(map(contains, lines[line_index], repeat(name)))):
+                        raise Exception(exception_string.format(name, line_index + 1))
+                    # optional fields left empty are filled up to the full field, '<' standing in for the check digit
+                    empty[name] = [value is None for value in column]
+                    column = ['' if value is None else value for value in column]
+                values[name] = column
+        if observe is not None:
+            started = observe("validation", started)
+
+        packed = {}
+        columns = []
+        for field, field_slice, width, role in self._slices:
+            if role == NAMES_FIELD:
+                packed[field] = pack_names_column(values["last_name"], values["given_name"], width)
+            else:
+                packed[field] = pack_field_column(values[field], width, field, self.name)
+            columns.append((field_slice.start, width, packed[field]))
+        composites = []
+        for field, check_position, positions, _ in self._checks:
+            if field == COMPOSITE:
+                composites.append((check_position, positions))
+                continue
+            check_digits = check_digit_column(packed[field], self.widths[field], count)
+            if field in empty:
+                check_digits = bytes(FILLER if is_empty else check_digit for is_empty, check_digit in zip(empty[field], check_digits))
+            columns.append((check_position, 1, check_digits))
+        if observe is not None:
+            started = observe("check_digits", started)
+
+        encoded_mrzs = assemble_records(self.template, count, columns, composites)
+        if observe is not None:
+            observe("assembly", started)
+        return encoded_mrzs
+
+    def encode(self, decoded_mrz: dict) -> str:
+        return self.encode_many([decoded_mrz])[0]
+
+TD3_LAYOUT = MRZLayout("TD3", MAX_MRZ_LENGTH, 2, "P", (
+    ("document_type", 0, 0, 1, HEADER_FIELD),
+    ("issuing_country", 0, 2, 3, HEADER_FIELD),
+    ("names", 0, 5, 39, NAMES_FIELD),
+    ("passport_number", 1, 0, 9, DATA_FIELD),
+    ("country_code", 1, 10, 3, DATA_FIELD),
+    ("birth_date", 1, 13, 6, DATA_FIELD),
+    ("sex", 1, 20, 1, DATA_FIELD),
+    ("expiration_date", 1, 21, 6, DATA_FIELD),
+    ("personal_number", 1, 28, 15, OPTIONAL_FIELD)
+), (
+    ("passport_number", 1, 9, ((1, 0, 9),)),
+    ("birth_date", 1, 19, ((1, 13, 6),)),
+    ("expiration_date", 1, 27, ((1, 21, 6),)),
+    # this codebase's TD3 layout runs the personal number up to position 43 with no composite digit
+    ("personal_number", 1, 43, ((1, 28, 15),))
+))
+TD1_LAYOUT = MRZLayout("TD1", 30, 3, "I", (
+    ("document_type", 0, 0, 2, HEADER_FIELD),
+    ("issuing_country", 0, 2, 3, HEADER_FIELD),
+    ("document_number", 0, 5, 9, DATA_FIELD),
+    ("optional_data", 0, 15, 15, OPTIONAL_FIELD),
+    ("birth_date", 1, 0, 6, DATA_FIELD),
+    ("sex", 1, 7, 1, DATA_FIELD),
+    ("expiration_date", 1, 8, 6, DATA_FIELD),
+    ("country_code", 1, 15, 3, DATA_FIELD),
+    ("optional_data_2", 1, 18, 11, OPTIONAL_FIELD),
+    ("names", 2, 0, 30, NAMES_FIELD)
+), (
+    ("document_number", 0, 14, ((0, 5, 9),)),
+    ("birth_date", 1, 6, ((1, 0, 6),)),
+    ("expiration_date", 1, 14, ((1, 8, 6),)),
+    (COMPOSITE, 1, 29, ((0, 5, 25), (1, 0, 7), (1, 8, 7), (1, 18, 11)))
+))
+TD2_LAYOUT = MRZLayout("TD2", 36, 2, "I", (
+    ("document_type", 0, 0, 2, HEADER_FIELD),
+    ("issuing_country", 0, 2, 3, HEADER_FIELD),
+    ("names", 0, 5, 31, NAMES_FIELD),
+    ("document_number", 1, 0, 9, DATA_FIELD),
+    ("country_code", 1, 10, 3, DATA_FIELD),
+    ("birth_date", 1, 13, 6, DATA_FIELD),
+    ("sex", 1, 20, 1, DATA_FIELD),
+    ("expiration_date", 1, 21, 6, DATA_FIELD),
+    ("optional_data", 1, 28, 7, OPTIONAL_FIELD)
+), (
+    ("document_number", 1, 9, ((1, 0, 9),)),
+    ("birth_date", 1, 19, ((1, 13, 6),)),
+    ("expiration_date", 1, 27, ((1, 21, 6),)),
+    (COMPOSITE, 1, 35, ((1, 0, 10), (1, 13, 7), (1, 21, 14)))
+))
+LAYOUTS = {layout.name: layout for layout in (TD1_LAYOUT, TD2_LAYOUT, TD3_LAYOUT)}
+# fixed-offset parser for a full TD3 input (two 44 character lines separated by ';'),
+# compiled once so batch decoding does not rescan each record with re.findall
+TD3_PATTERN = TD3_LAYOUT.pattern
+
+"""
+helper function to resolve a layout given as an MRZLayout or by name
+"""
+def get_layout(layout) -> MRZLayout:
+    if isinstance(layout, MRZLayout):
+        return layout
+    if layout not in LAYOUTS:
+        raise Exception("Unknown MRZ layout {!r}, expected one of {}".format(layout, ', '.join(sorted(LAYOUTS))))
+    return LAYOUTS[layout]
+
+# separators skipped between the values of a streamed JSON array
+JSON_SEPARATORS = re.compile(r"[\s,]*")
+STREAM_CHUNK_SIZE = 1 << 16
+
+"""
+helper function to read a text or binary stream as decoded text chunks
+"""
+def _iter_text_chunks(stream, chunk_size: int):
+    decoder = None
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        if isinstance(chunk, bytes):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder('utf-8')()
+            chunk = decoder.decode(chunk)
+        yield chunk
+    if decoder is not None:
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+
+"""
+helper function to split streamed text chunks into lines without reading the whole input
+"""
+def _iter_lines(buffer: str, chunks):
+    while True:
+        lines = buffer.split('\n')
+        buffer = lines.pop()
+        yield from lines
+        chunk = next(chunks, None)
+        if chunk is None:
+            break
+        buffer += chunk
+    yield buffer
+
+"""
+helper function to incrementally parse the values of the JSON array stored under key;
+only the current chunk and the value being parsed are kept in memory
+"""
+def _iter_json_array(buffer: str, chunks, key: str, chunk_size: int):
+    decoder = json.JSONDecoder()
+    marker = re.compile(r'"{}"\s*:\s*\['.format(re.escape(key)))
+    match = marker.search(buffer)
+    while match is None:
+        chunk = next(chunks, None)
+        if chunk is None:
+            raise Exception("The MRZ input stream does not contain a '{}' array".format(key))
+        buffer += chunk
+        match = marker.search(buffer)
+
+    index = match.end()
+    consumed = 0  # characters dropped from the front of the buffer, for error offsets
+    while True:
+        index = JSON_SEPARATORS.match(buffer, index).end()
+        if index < len(buffer) and buffer[index] == ']':
+            return
+        try:
+            if index == len(buffer):
+                raise json.JSONDecodeError("Expecting value", buffer, index)
+            value, index = decoder.raw_decode(buffer, index)
+        except json.JSONDecodeError as error:
+            # only a value running into the end of the buffer can be cut at the chunk boundary;
+            # anything else is corrupt and would otherwise make the buffer swallow the rest of the input
+            if error.pos < len(buffer) and not error.msg.startswith("Unterminated string"):
+                raise Exception("The MRZ input stream holds an invalid value in the '{}' array at offset {}: {}".format(
+                    key, consumed + error.pos, error.msg))
+            chunk = next(chunks, None)
+            if chunk is None:
+                raise Exception("The MRZ input stream ended inside the '{}' array".format(key))
+            consumed += index
+            buffer = buffer[index:] + chunk
+            index = 0
+            continue
+        yield value
+        if index >= chunk_size:
+            consumed += index
+            buffer = buffer[index:]
+            index = 0
+
+"""
+Method to stream records from a file path, text stream or binary stream one at a time;
+accepts newline-delimited MRZ text, JSON Lines and the {"records_encoded": [...]} layout
+(the array is expected as the first member of the JSON document)
+"""
+def iter_mrz_records(source, key: str = 'records_encoded', chunk_size: int = STREAM_CHUNK_SIZE):
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as stream:
+            yield from iter_mrz_records(stream, key, chunk_size)
+        return
+
+    # buffer enough of the input to tell a JSON document holding the key from JSON Lines
+    chunks = _iter_text_chunks(source, chunk_size)
+    buffer = ''
+    for chunk in chunks:
+        buffer += chunk
+        if len(buffer.lstrip()) >= len(key) + 64:
+            break
+    buffer = buffer.lstrip()
+    if re.match(r'\{{\s*"{}"\s*:'.format(re.escape(key)), buffer):
+        yield from _iter_json_array(buffer, chunks, key, chunk_size)
+        return
+
+    for line in _iter_lines(buffer, chunks):
+        line = line.strip()
+        if not line:
+            continue
+        yield json.loads(line) if line[0] in '"{' else line
+
+class MRZRecord(NamedTuple):
+    """
+    compact tuple-backed decoded MRZ record; line 2 fields are None when the
+    record was decoded with a failing check digit, like the dict from decode_mrz_input
+    """
+    document_type: str = "P"
+    issuing_country: str = None
+    last_name: str = None
+    given_name: str = None
+    passport_number: str = None
+    country_code: str = None
+    birth_date: str = None
+    sex: str = None
+    expiration_date: str = None
+    personal_number: str = None
+
+    """
+    build a record from the flat dict returned by decode_mrz_input
+    """
+    @classmethod
+    def from_dict(cls, decoded_mrz: dict) -> 'MRZRecord':
+        return cls(decoded_mrz.get("document_type", "P"), *map(decoded_mrz.get, cls._fields[1:]))
+
+    """
+    build a record from the {"line1": ..., "line2": ...} payload accepted by encode_mrz_input
+    """
+    @classmethod
+    def from_encode_dict(cls, decoded_mrz: dict) -> 'MRZRecord':
+        line_1 = decoded_mrz['line1']
+        line_2 = decoded_mrz['line2']
+        return cls("P", *map(line_1.get, LINE_1_FIELDS), *map(line_2.get, LINE_2_FIELDS))
+
+    """
+    convert back to the flat decode_mrz_input dict, leaving out fields that are None
+    """
+    def to_dict(self) -> dict:
+        return {field: value for field, value in zip(self._fields, self) if value is not None}
+
+    """
+    convert to the encode_mrz_input payload, leaving out fields that are None so a missing
+    field raises the usual encode error; personal_number is optional and stays None, which
+    encodes as filler
+    """
+    def to_encode_dict(self) -> dict:
+        line_2 = {field: getattr(self, field) for field in LINE_2_FIELDS if getattr(self, field) is not None}
+        line_2.setdefault("personal_number", None)
+        return {
+            "line1": {field: getattr(self, field) for field in LINE_1_FIELDS if getattr(self, field) is not None},
+            "line2": line_2
+        }
+
+# bit flags for the fields of a ValidationResult that failed validation
+PASSPORT_NUMBER_INVALID = 1
+BIRTH_DATE_INVALID = 2
+EXPIRATION_DATE_INVALID = 4
+PERSONAL_NUMBER_INVALID = 8
+MALFORMED_INPUT = 16
+VALIDATION_FLAGS = (
+    ("passport_number", PASSPORT_NUMBER_INVALID),
+    ("birth_date", BIRTH_DATE_INVALID),
+    ("expiration_date", EXPIRATION_DATE_INVALID),
+    ("personal_number", PERSONAL_NUMBER_INVALID),
+    ("malformed", MALFORMED_INPUT)
+)
+
+class ValidationResult:
+    """
+    compact, immutable per-record validation outcome; failed is a bitmask of the
+    *_INVALID / MALFORMED_INPUT flags, 0 when every check digit matched
+    """
+    __slots__ = ('failed',)
+
+    def __init__(self, failed: int = 0):
+        object.__setattr__(self, 'failed', failed)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ValidationResult is immutable")
+
+    @property
+    def valid(self) -> bool:
+        return self.failed == 0
+
+    @property
+    def failed_fields(self) -> list:
+        return [field for field, flag in VALIDATION_FLAGS if self.failed & flag]
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ValidationResult) and other.failed == self.failed
+
+    def __hash__(self) -> int:
+        return hash(self.failed)
+
+    def __repr__(self) -> str:
+        return "ValidationResult(failed={})".format(self.failed_fields)
+
+# one shared instance per bitmask, so validating a batch allocates no result objects
+VALIDATION_RESULTS = tuple(ValidationResult(failed) for failed in range(MALFORMED_INPUT * 2))
+
+class ValidationSummary:
+    """
+    running counters over many ValidationResults, cheap enough to keep for every batch
+    """
+    __slots__ = ('total', 'valid', 'field_failures')
+
     def __init__(self):
+        self.total = 0
+        self.valid = 0
+        self.field_failures = dict.fromkeys((field for field, _ in VALIDATION_FLAGS), 0)
+
+    def add(self, result: ValidationResult) -> None:
+        self.total += 1
+        if result.failed == 0:
+            self.valid += 1
+            return
+        for field, flag in VALIDATION_FLAGS:
+            if result.failed & flag:
+                self.field_failures[field] += 1
+
+    @property
+    def invalid(self) -> int:
+        return self.total - self.valid
+
+    @property
+    def error_rate(self) -> float:
+        return self.invalid / self.total if self.total else 0.0
+
+    def as_dict(self) -> dict:
+        return {"total": self.total, "valid": self.valid, "invalid": self.invalid,
+                "error_rate": self.error_rate, "field_failures": dict(self.field_failures)}
+
+"""
+helper function to compare a check digit without raising or printing; a field holding
+characters outside the ICAO alphabet can never match its check digit
+@param optional: the field is optional, so an empty field may carry '<' as its check digit
+"""
+def check_digit_matches(field: str, check_digit: str, optional: bool = False) -> bool:
+    if optional and check_digit == '<':
+        check_digit = '0'
+    try:
+        return compute_check_digit(field) == int(check_digit)
+    except Exception:
+        return False
+
+# a packed TD3 record is both lines joined by the ';' separator
+RECORD_LENGTH = 2 * MAX_MRZ_LENGTH + 1
+"""
+helper function to list the (column, offset, width) of the fields and check digits on one line
+of a layout, in record order, offsets relative to the start of the line
+"""
+def _line_columns(layout: MRZLayout, line: int) -> tuple:
+    line_start = line * (layout.line_length + 1)
+    line_end = line_start + layout.line_length
+    columns = []
+    for field, field_slice, check_position in layout.field_positions:
+        if line_start <= field_slice.start < line_end:
+            columns.append((field, field_slice.start - line_start, field_slice.stop - field_slice.start))
+        if check_position is not None and line_start <= check_position < line_end:
+            columns.append((check_digit_name(field), check_position - line_start, 1))
+    return tuple(columns)
+
+# (field, offset, width) of the TD3 columns, offsets relative to the start of their line
+TD3_LINE_1_COLUMNS = _line_columns(TD3_LAYOUT, 0)
+TD3_LINE_2_COLUMNS = _line_columns(TD3_LAYOUT, 1)
+# (field, check digit column, flag, optional) validated column by column; the personal number
+# check digit covers its '<' filler, which weighs 0, and is itself '<' when the field is empty
+TD3_CHECKED_COLUMNS = tuple(
+    (field, check_digit_name(field), dict(VALIDATION_FLAGS)[field], field in TD3_LAYOUT.optional_fields)
+    for field, _, check_position in TD3_LAYOUT.field_positions if check_position is not None
+)
+ICAO_CHARACTER_FLAGS = bytes(0 if code in ICAO_CHARACTERS else 1 for code in range(256))
+NONZERO_FLAGS = b'\x00' + b'\x01' * 255
+
+class MRZColumns:
+    """
+    struct-of-arrays result of decode_columnar: every field is one fixed-width bytes column
+    of count * width bytes, and failed holds one ValidationResult bitmask byte per record
+    """
+    def __init__(self, count: int, columns: dict, widths: dict, failed: bytes):
+        self.count = count
+        self.columns = columns
+        self.widths = widths
+        self.failed = failed
+
+    def __len__(self) -> int:
+        return self.count
+
+    """
+    number of records whose check digits all matched
+    """
+    @property
+    def valid_count(self) -> int:
+        return self.failed.count(0)
+
+    """
+    raw bytes of one field of one record
+    """
+    def value(self, field: str, index: int) -> bytes:
+        width = self.widths[field]
+        return self.columns[field][index * width:(index + 1) * width]
+
+"""
+helper function to pack MRZ strings into one buffer of fixed-length records for decode_columnar
+"""
+def pack_mrz_records(encoded_mrzs) -> bytes:
+    encoded_mrzs = list(encoded_mrzs)
+    if not all(map(RECORD_LENGTH.__eq__, map(len, encoded_mrzs))):
+        raise Exception("The MRZ input provided cannot be packed because a record is not {} characters long".format(RECORD_LENGTH))
+    return ''.join(encoded_mrzs).encode('ascii')
+
+"""
+helper function to copy one field out of every packed record into a row-major column
+with one strided slice per character position
+"""
+def _extract_column(buffer, count: int, record_length: int, offset: int, width: int) -> bytes:
+    if width == 1:
+        return bytes(buffer[offset::record_length])
+    column = bytearray(count * width)
+    for position in range(width):
+        column[position::width] = buffer[offset + position::record_length]
+    return bytes(column)
+
+"""
+helper function to turn a bytes column into 0/1 lanes flagging the records that differ
+"""
+def _mismatch_lanes(actual: bytes, expected: bytes, count: int) -> int:
+    difference = int.from_bytes(actual, 'little') ^ int.from_bytes(expected, 'little')
+    return int.from_bytes(difference.to_bytes(count, 'little').translate(NONZERO_FLAGS), 'little')
+
+"""
+Method to decode a packed buffer of fixed-length TD3 records (see pack_mrz_records) into
+per-field byte columns and validate every check digit column at once, without creating
+Python objects per record
+@param record_length: 89 for ';' separated records, 88 for the separator-less archive layout
+"""
+def decode_columnar(buffer, record_length: int = RECORD_LENGTH) -> MRZColumns:
+    if len(buffer) % record_length:
+        raise Exception("The MRZ buffer provided is not a whole number of {} byte records".format(record_length))
+    count = len(buffer) // record_length
+    line_2_offset = record_length - MAX_MRZ_LENGTH
+    columns = {}
+    widths = {}
+    for line_offset, line_columns in ((0, TD3_LINE_1_COLUMNS), (line_2_offset, TD3_LINE_2_COLUMNS)):
+        for field, offset, width in line_columns:
+            columns[field] = _extract_column(buffer, count, record_length, line_offset + offset, width)
+            widths[field] = width
+
+    failed = 0
+    for field, check_digit_field, flag, optional in TD3_CHECKED_COLUMNS:
+        packed = columns[field]
+        width = widths[field]
+        check_digits = columns[check_digit_field]
+        if optional:
+            check_digits = check_digits.replace(b'<', b'0')
+        lanes = _mismatch_lanes(check_digit_column(packed, width, count), check_digits, count)
+        if packed.translate(None, ICAO_CHARACTERS):
+            # any illegal character fails the field, mirroring the ICAO character exception
+            illegal = packed.translate(ICAO_CHARACTER_FLAGS)
+            for position in range(width):
+                lanes |= int.from_bytes(illegal[position::width], 'little')
+        failed += lanes * flag
+    return MRZColumns(count, columns, widths, failed.to_bytes(count, 'little'))
+
+FIELD_WIDTH_MESSAGE = "The field '{}' does not fit in the {} characters of the {} layout. Aborting operation."
+
+"""
+helper function to turn a joined column into upper-case ASCII bytes, raising for any
+character outside the ICAO alphabet
+"""
+def _encode_column(joined: str) -> bytes:
+    if not joined.isascii():
+        raise Exception(ILLEGAL_CHARACTER_MESSAGE.format(next(val for val in joined if not val.isascii())))
+    packed = joined.encode('ascii').upper()
+    illegal = packed.translate(None, ICAO_CHARACTERS)
+    if illegal:
+        raise Exception(ILLEGAL_CHARACTER_MESSAGE.format(chr(illegal[0])))
+    return packed
+
+"""
+helper function to pack a batch of field values into one fixed-width column of count * width
+upper-case ASCII bytes padded with '<'; a value longer than the field raises
+"""
+def pack_field_column(values: list, width: int, field: str, layout_name: str = "TD3") -> bytes:
+    count = len(values)
+    # fixed-width fields mostly arrive at full width: joined with '\n', every value is exactly
+    # width characters long when the only '\n' characters fall every width + 1 characters
+    joined = '\n'.join(values)
+    if len(joined) == (width + 1) * count - 1 and joined.count('\n') == count - 1 \
+            and joined[width::width + 1] == '\n' * (count - 1):
+        return _encode_column(joined.replace('\n', ''))
+    joined = ''.join(map(str.ljust, values, repeat(width), repeat('<')))
+    # ljust never shortens a value, so the column only overruns when a value is too long
+    if len(joined) != width * count:
+        raise Exception(FIELD_WIDTH_MESSAGE.format(field, width, layout_name))
+    return _encode_column(joined)
+
+"""
+helper function to upper-case one field value and pad it to its width with '<', the rule
+pack_field_column applies to a whole column; a value longer than the field raises
+"""
+def pad_field(value: str, width: int, field: str, layout_name: str = "TD3") -> str:
+    if len(value) > width:
+        raise Exception(FIELD_WIDTH_MESSAGE.format(field, width, layout_name))
+    return value.upper().ljust(width, '<')
+
+"""
+helper function to join the last and given names of one record like pack_names_column
+"""
+def pad_names(last_name: str, given_name: str, width: int) -> str:
+    return (last_name + '<<' + given_name).upper().replace(' ', '<')[:width].ljust(width, '<')
+
+"""
+helper function to pack the '<<' separated last and given names of a batch into one column,
+the given names separated by '<'; names longer than width are truncated, as ICAO 9303 prescribes
+"""
+def pack_names_column(last_names: list, given_names: list, width: int) -> bytes:
+    names = list(map('<<'.join, zip(last_names, given_names)))
+    joined = ''.join(map(str.ljust, names, repeat(width), repeat('<')))
+    if len(joined) != width * len(names):
+        joined = ''.join([name[:width].ljust(width, '<') for name in names])
+    return _encode_column(joined.replace(' ', '<'))
+
+"""
+helper function to assemble count records from packed columns: the record template is
+repeated into one preallocated buffer and each column is copied in with one strided slice
+per character position
+@param columns: (offset, width, packed column) of every field and check digit column
+@param composites: (check digit position, covered positions) of the check digits computed
+over the assembled records, in order
+@return list of the count records as strings
+"""
+def assemble_records(template: bytes, count: int, columns, composites=()) -> list:
+    # every record is followed by '\n', which no packed column can hold, so one split cuts the records apart
+    record_length = len(template) + 1
+    buffer = bytearray(template + b'\n') * count
+    for offset, width, packed in columns:
+        for position in range(width):
+            buffer[offset + position::record_length] = packed[position::width]
+    for check_position, positions in composites:
+        column = _gather_column(buffer, count, record_length, positions)
+        buffer[check_position::record_length] = check_digit_column(column, len(positions), count)
+    records = buffer.decode('ascii').split('\n')
+    records.pop()
+    return records
+
+# pre-validation character classes, one bit each; a record passes when no byte falls in a
+# class its position disallows, so the check is one translate and one integer AND per record
+ILLEGAL_CLASS = 1
+DIGIT_CLASS = 2
+LETTER_CLASS = 4
+SEX_CLASS = 8  # the letters M, F and X
+FILLER_CLASS = 16
+SEPARATOR_CLASS = 32
+CHARACTER_CLASSES = bytes(
+    DIGIT_CLASS if chr(code).isdigit() and code < 128 else
+    SEX_CLASS if chr(code) in 'MFX' else
+    # '<' is in the character map as well, so it has to be classed before the letters
+    FILLER_CLASS if chr(code) == '<' else
+    LETTER_CLASS if chr(code) in CHARACTER_MAP else
+    SEPARATOR_CLASS if chr(code) == ';' else
+    ILLEGAL_CLASS
+    for code in range(256)
+)
+TEXT_CLASSES = LETTER_CLASS | SEX_CLASS | FILLER_CLASS
+ALPHANUMERIC_CLASSES = DIGIT_CLASS | TEXT_CLASSES
+# allowed classes of the TD3 fields; check digits take DIGIT_CLASS, with FILLER_CLASS as well
+# for an optional field, and positions no field covers take TEXT_CLASSES
+TD3_FIELD_CLASSES = {
+    "document_type": LETTER_CLASS | SEX_CLASS,
+    "issuing_country": TEXT_CLASSES,
+    "names": TEXT_CLASSES,
+    "passport_number": ALPHANUMERIC_CLASSES,
+    "country_code": TEXT_CLASSES,
+    "birth_date": DIGIT_CLASS,
+    "sex": SEX_CLASS | FILLER_CLASS,
+    "expiration_date": DIGIT_CLASS,
+    "personal_number": ALPHANUMERIC_CLASSES
+}
+
+"""
+helper function to list the (name, width, allowed classes) of every position of a layout, in
+record order; the position following a one character document type is its subtype
+"""
+def _position_classes(layout: MRZLayout, field_classes: dict) -> tuple:
+    entries = {position * (layout.line_length + 1) - 1: ("separator", 1, SEPARATOR_CLASS) for position in range(1, layout.line_count)}
+    for field, field_slice, check_position in layout.field_positions:
+        entries[field_slice.start] = (field, field_slice.stop - field_slice.start, field_classes[field])
+        if check_position is not None:
+            optional = FILLER_CLASS if field in layout.optional_fields else 0
+            entries[check_position] = (check_digit_name(field), 1, DIGIT_CLASS | optional)
+    classes = []
+    position = 0
+    while position < layout.record_length:
+        entry = entries.get(position, ("document_subtype" if position == 1 else "filler", 1, TEXT_CLASSES))
+        classes.append(entry)
+        position += entry[1]
+    return tuple(classes)
+
+# (field, width, allowed classes) for every position of a TD3 record, in order
+TD3_POSITION_CLASSES = _position_classes(TD3_LAYOUT, TD3_FIELD_CLASSES)
+POSITION_FIELDS = tuple(field for field, width, _ in TD3_POSITION_CLASSES for _ in range(width))
+POSITION_ALLOWED = bytes(allowed for _, width, allowed in TD3_POSITION_CLASSES for _ in range(width))
+DISALLOWED_BYTES = bytes(0xFF ^ allowed for allowed in POSITION_ALLOWED)
+DISALLOWED_CLASSES = int.from_bytes(DISALLOWED_BYTES, 'little')
+CLASS_DESCRIPTIONS = (
+    (DIGIT_CLASS, "a digit"),
+    (LETTER_CLASS | SEX_CLASS, "a letter"),
+    (SEX_CLASS, "M, F or X"),
+    (FILLER_CLASS, "'<'"),
+    (SEPARATOR_CLASS, "';'")
+)
+
+"""
+helper function to list why a record failed pre-validation, one reason per bad position
+"""
+def _prevalidation_reasons(encoded_mrz: str) -> tuple:
+    if len(encoded_mrz) != RECORD_LENGTH:
+        return ("expected {} characters, got {}".format(RECORD_LENGTH, len(encoded_mrz)),)
+    classes = encoded_mrz.encode('ascii', 'replace').translate(CHARACTER_CLASSES)
+    reasons = []
+    for position, (character_class, allowed) in enumerate(zip(classes, POSITION_ALLOWED)):
+        if character_class & allowed:
+            continue
+        if character_class == ILLEGAL_CLASS:
+            reasons.append("illegal character {!r} at position {} ({})".format(encoded_mrz[position], position, POSITION_FIELDS[position]))
+            continue
+        expected = ' or '.join(description for flags, description in CLASS_DESCRIPTIONS
+                               if allowed & flags == flags and (flags != SEX_CLASS or not allowed & LETTER_CLASS))
+        reasons.append("expected {} at position {} ({}), got {!r}".format(expected, position, POSITION_FIELDS[position], encoded_mrz[position]))
+    return tuple(reasons)
+
+"""
+Method to check the structure of a TD3 input in a single pass before any decoding: length,
+';' separator, ICAO alphabet and the positions that must hold digits, letters or filler
+@return tuple of human readable reasons, empty when the input is well-formed
+"""
+def prevalidate_mrz(encoded_mrz: str) -> tuple:
+    if len(encoded_mrz) == RECORD_LENGTH and \
+            not int.from_bytes(encoded_mrz.encode('ascii', 'replace').translate(CHARACTER_CLASSES), 'little') & DISALLOWED_CLASSES:
+        return ()
+    return _prevalidation_reasons(encoded_mrz)
+
+"""
+Method to split a batch of TD3 inputs into well-formed and malformed records before the
+costly decode; each chunk of records is checked with one translate and one AND and only
+chunks holding a malformed record are rescanned record by record
+@return tuple of the list of well-formed inputs and a list of (index, input, reasons)
+"""
+def partition_mrz_inputs(encoded_mrzs, chunk_size: int = 1024) -> tuple:
+    encoded_mrzs = list(encoded_mrzs)
+    valid = []
+    invalid = []
+    for start in range(0, len(encoded_mrzs), chunk_size):
+        chunk = encoded_mrzs[start:start + chunk_size]
+        if all(map(RECORD_LENGTH.__eq__, map(len, chunk))):
+            classes = ''.join(chunk).encode('ascii', 'replace').translate(CHARACTER_CLASSES)
+            if not int.from_bytes(classes, 'little') & _chunk_mask(len(chunk)):
+                valid.extend(chunk)
+                continue
+        for index, encoded_mrz in enumerate(chunk, start):
+            reasons = prevalidate_mrz(encoded_mrz)
+            if reasons:
+                invalid.append((index, encoded_mrz, reasons))
+            else:
+                valid.append(encoded_mrz)
+    return valid, invalid
+
+"""
+helper function returning DISALLOWED_CLASSES repeated for count packed records, cached for
+the few chunk sizes a partition uses (the full chunk size and the last partial chunk)
+"""
+@lru_cache(maxsize=16)
+def _chunk_mask(count: int) -> int:
+    return int.from_bytes(DISALLOWED_BYTES * count, 'little')
+
+# fixed-width archive: a small header followed by records of both 44 character lines without separator
+ARCHIVE_MAGIC = b'MRZA'
+ARCHIVE_VERSION = 1
+ARCHIVE_RECORD_LENGTH = 2 * MAX_MRZ_LENGTH
+ARCHIVE_HEADER = struct.Struct('<4sHHQ')  # magic, version, record length, record count
+
+class MRZArchiveWriter:
+    """
+    writes encoded MRZ strings to a fixed-width archive; the record count in the
+    header is filled in when the writer is closed
+    """
+    def __init__(self, path):
+        self.count = 0
+        self._file = open(path, 'wb')
+        self._file.write(ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, ARCHIVE_RECORD_LENGTH, 0))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    """
+    Method to append one encoded MRZ string
+    """
+    def write(self, encoded_mrz: str) -> None:
+        self.write_many([encoded_mrz])
+
+    """
+    Method to append many encoded MRZ strings as one packed write
+    """
+    def write_many(self, encoded_mrzs) -> None:
+        packed = pack_mrz_records(encoded_mrzs)
+        count = len(packed) // RECORD_LENGTH
+        # ';' is outside the ICAO alphabet, so it may only appear as the line separator
+        if packed[MAX_MRZ_LENGTH::RECORD_LENGTH] != b';' * count or packed.count(b';') != count:
+            raise Exception("The MRZ input provided cannot be archived because the lines are not separated by ';' at position {}".format(MAX_MRZ_LENGTH))
+        self._file.write(packed.replace(b';', b''))
+        self.count += count
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self._file.seek(0)
+        self._file.write(ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, ARCHIVE_RECORD_LENGTH, self.count))
+        self._file.close()
+
+class MRZArchive:
+    """
+    memory-mapped reader of a fixed-width archive with O(1) access to record i;
+    record() and records() return zero-copy memoryviews into the mapping, which must
+    be released before the archive is closed
+    """
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._mmap = None
+        try:
+            # an empty file cannot be mapped and a file shorter than the header cannot be unpacked
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, record_length, count = ARCHIVE_HEADER.unpack_from(self._mmap)
+        except (ValueError, struct.error):
+            self.close()
+            raise Exception("The file provided is not a version {} MRZ archive".format(ARCHIVE_VERSION))
+        if magic != ARCHIVE_MAGIC or version != ARCHIVE_VERSION or record_length != ARCHIVE_RECORD_LENGTH:
+            self.close()
+            raise Exception("The file provided is not a version {} MRZ archive".format(ARCHIVE_VERSION))
+        if len(self._mmap) != ARCHIVE_HEADER.size + count * record_length:
+            self.close()
+            raise Exception("The MRZ archive is truncated: expected {} records".format(count))
+        self.count = count
+        self._view = memoryview(self._mmap)[ARCHIVE_HEADER.size:]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    """
+    encoded MRZ string of record i, lines joined by ';' as accepted by decode_mrz_input
+    """
+    def __getitem__(self, index: int) -> str:
+        record = self.record(index)
+        return bytes(record[:MAX_MRZ_LENGTH]).decode('ascii') + ';' + bytes(record[MAX_MRZ_LENGTH:]).decode('ascii')
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self[index]
+
+    """
+    zero-copy view of the raw bytes of record i
+    """
+    def record(self, index: int) -> memoryview:
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("MRZ archive record index out of range")
+        start = index * ARCHIVE_RECORD_LENGTH
+        return self._view[start:start + ARCHIVE_RECORD_LENGTH]
+
+    """
+    zero-copy view of the packed records in [start, stop)
+    """
+    def records(self, start: int = 0, stop: int = None) -> memoryview:
+        start, stop, _ = slice(start, stop).indices(self.count)
+        return self._view[start * ARCHIVE_RECORD_LENGTH:max(start, stop) * ARCHIVE_RECORD_LENGTH]
+
+    """
+    Method to decode the records in [start, stop) straight from the mapping into columns
+    """
+    def decode_columnar(self, start: int = 0, stop: int = None) -> MRZColumns:
+        return decode_columnar(self.records(start, stop), record_length=ARCHIVE_RECORD_LENGTH)
+
+    """
+    Method to decode the records in [start, stop) into one fresh dict per record
+    """
+    def decode_many(self, start: int = 0, stop: int = None) -> list:
+        return MachineReadableTravelDocument().decode_many(self[index] for index in range(*slice(start, stop).indices(self.count)))
+
+    def close(self) -> None:
+        if getattr(self, '_view', None) is not None:
+            self._view.release()
+            self._view = None
+        if self._mmap is not None and not self._mmap.closed:
+            self._mmap.close()
+        self._file.close()
+
+"""
+Method to convert a JSON (or JSON Lines / text) file of encoded MRZ strings into a
+fixed-width archive, streaming it in batches
+@return number of records written
+"""
+def convert_json_to_archive(json_path, archive_path, batch_size: int = 10000) -> int:
+    with MRZArchiveWriter(archive_path) as writer:
+        batch = []
+        for encoded_mrz in iter_mrz_records(json_path):
+            batch.append(encoded_mrz)
+            if len(batch) == batch_size:
+                writer.write_many(batch)
+                batch = []
+        if batch:
+            writer.write_many(batch)
+        return writer.count
+
+"""
+helper function to build the lazy decoder of a field guarded by a check digit; the field
+decodes to None when its own check digit does not match
+"""
+def _checked_field_decoder(field_slice: slice, check_digit_index: int, optional: bool = False):
+    def decode_field(encoded_mrz: str):
+        value = encoded_mrz[field_slice]
+        if optional:
+            value = value.partition('<')[0]
+        return value if check_digit_matches(value, encoded_mrz[check_digit_index], optional) else None
+    return decode_field
+
+"""
+helper function to build the lazy decoders of the last and given names from the names slice
+"""
+def _name_decoders(names_slice: slice) -> tuple:
+    def decode_last_name(encoded_mrz: str) -> str:
+        return encoded_mrz[names_slice].partition('<<')[0]
+    def decode_given_name(encoded_mrz: str) -> str:
+        return ' '.join(encoded_mrz[names_slice].partition('<<')[2].split('<')[:2]).strip()
+    return decode_last_name, decode_given_name
+
+"""
+helper function to build the lazy per-field decoders from the compiled slices and check
+digits of a layout, so lazy records and field projections read the layout's own offsets
+"""
+def _lazy_field_decoders(layout: MRZLayout) -> dict:
+    check_positions = {field: check_position for field, check_position, _, _ in layout._checks}
+    decoders = {}
+    for field, field_slice, _, role in layout._slices:
+        if role == NAMES_FIELD:
+            decoders["last_name"], decoders["given_name"] = _name_decoders(field_slice)
+        elif field in check_positions:
+            # the optional personal number runs up to its '<' filler
+            decoders[field] = _checked_field_decoder(field_slice, check_positions[field], optional=role == OPTIONAL_FIELD)
+        else:
+            decoders[field] = itemgetter(field_slice)
+    return decoders
+
+# field -> function decoding that one field from a TD3 record, each touching only its own
+# slice (and check digit); fields without a check digit are returned as sliced
+LAZY_FIELD_DECODERS = _lazy_field_decoders(TD3_LAYOUT)
+CHECKED_FIELDS = tuple(field for field, _, _, _ in TD3_LAYOUT._checks if field != COMPOSITE)
+HEADER_DECODED_FIELDS = ("document_type",) + LINE_1_FIELDS
+
+"""
+helper function to reject input that is not a ';' separated TD3 record before lazy decoding
+"""
+def _require_td3_record(encoded_mrz: str) -> None:
+    if len(encoded_mrz) != RECORD_LENGTH or encoded_mrz[MAX_MRZ_LENGTH] != ';':
+        raise Exception("The MRZ input provided cannot be parsed because it does not match the fixed TD3 layout: {}".format(encoded_mrz))
+
+"""
+helper function to resolve a field projection into its lazy decoders
+"""
+def _field_decoders(fields) -> tuple:
+    unknown = [field for field in fields if field not in LAZY_FIELD_DECODERS]
+    if unknown:
+        raise Exception("Unknown MRZ field(s) {}, expected any of {}".format(', '.join(unknown), ', '.join(LAZY_FIELD_DECODERS)))
+    return tuple((field, LAZY_FIELD_DECODERS[field]) for field in fields)
+
+"""
+helper function to decode only the projected fields of one TD3 record
+"""
+def _project_fields(decoders: tuple, encoded_mrz: str) -> dict:
+    _require_td3_record(encoded_mrz)
+    projected = {}
+    for field, decode_field in decoders:
+        value = decode_field(encoded_mrz)
+        if value is not None:
+            projected[field] = value
+    return projected
+
+class LazyMRZRecord:
+    """
+    decoded view over a raw TD3 string that slices and validates each field on first access
+    and caches it; a field whose own check digit does not match reads as None. For a
+    well-formed record to_dict() materializes the same dict as decode_many, where any failing
+    check digit drops every line 2 field. Only the length and separator are checked up front,
+    so a record decode_many rejects as malformed (e.g. a non-digit check digit) decodes here
+    with the affected fields read as None instead of raising.
+    """
+    __slots__ = ("encoded_mrz", "_values")
+
+    def __init__(self, encoded_mrz: str):
+        _require_td3_record(encoded_mrz)
+        self.encoded_mrz = encoded_mrz
+        self._values = {}
+
+    def __getattr__(self, field: str):
+        decode_field = LAZY_FIELD_DECODERS.get(field)
+        if decode_field is None:
+            raise AttributeError("'LazyMRZRecord' object has no attribute '{}'".format(field))
+        values = self._values
+        if field not in values:
+            values[field] = decode_field(self.encoded_mrz)
+        return values[field]
+
+    def __getitem__(self, field: str):
+        value = getattr(self, field) if field in LAZY_FIELD_DECODERS else None
+        if value is None:
+            raise KeyError(field)
+        return value
+
+    def get(self, field: str, default=None):
+        value = getattr(self, field) if field in LAZY_FIELD_DECODERS else None
+        return default if value is None else value
+
+    def __repr__(self) -> str:
+        return "LazyMRZRecord({!r})".format(self.encoded_mrz)
+
+    """
+    true when every check digit of the record matches
+    """
+    @property
+    def valid(self) -> bool:
+        return all(getattr(self, field) is not None for field in CHECKED_FIELDS)
+
+    def to_dict(self) -> dict:
+        fields = LAZY_FIELD_DECODERS if self.valid else HEADER_DECODED_FIELDS
+        return {field: getattr(self, field) for field in fields}
+
+class MachineReadableTravelDocument:
+    """
+    @param instrumentation: optional sink with an observe(stage, elapsed_ns) method (see
+    MRTDMetrics) receiving per-stage timings of decode_mrz_input/encode_mrz_input, per record
+    of the TD3 decode_many/decode and per batch of the TD3 encode_many; the layout= and
+    fields= batches report one stage per batch. When it is None the only cost is one
+    attribute check per stage
+    """
+    def __init__(self, instrumentation=None):
         self.decoded_mrz = {}
         self.encoded_mrz = ""
-        self.cmap = CharacterMap().character_map
+        self.cmap = CHARACTER_MAP
+        self.instrumentation = instrumentation
 
     """ 
     Empty method that returns an empty String to emulate hardware scanner 
@@ -26,14 +1267,20 @@ class MachineReadableTravelDocument:
     """
     Method to take given MRZ input from scanner
     and prepare JSON payload for DB to commit/save
+    @param as_record: return a compact MRZRecord instead of the decoded dict
     """
-    def decode_mrz_input(self, encoded_mrz: str) -> dict():
+    def decode_mrz_input(self, encoded_mrz: str, as_record: bool = False) -> dict():
+        sink = self.instrumentation
+        if sink is not None:
+            started = perf_counter_ns()
         lines = encoded_mrz.split(";")
         if len(lines) != 2:
             raise Exception("The MRZ input provided cannot be parsed because there were not two identifiable MRZ lines")
         
         line_1 = lines[0]
         line_2 = lines[1]
+        if sink is not None:
+            started = self._observe("split", started)
 
         # line_1 decoding
         country_name_combo = re.findall(r"\<(.*?)\<", line_1)[0]
@@ -44,6 +1291,8 @@ class MachineReadableTravelDocument:
         self.decoded_mrz["issuing_country"] = country_name_combo[0:3]
         self.decoded_mrz["last_name"] = country_name_combo[3:len(country_name_combo)]
         self.decoded_mrz["given_name"] = given_name.strip()
+        if sink is not None:
+            started = self._observe("line1_names", started)
 
         # line_2 decoding
         passport_number = line_2[0:9]
@@ -56,6 +1305,8 @@ class MachineReadableTravelDocument:
         expiration_date_check_digit = int(line_2[27])
         personal_number = re.findall(r"(.*?)\<+", line_2[28:len(line_2)])[0]
         personal_number_check_digit = int(re.findall(r"\<+(\d+)$", line_2)[0])
+        if sink is not None:
+            self._observe("line2_slice", started)
 
         if (
             self.is_check_digit_valid(field=passport_number, check_digit=passport_check_digit, field_identifier="Passport") and
@@ -70,13 +1321,157 @@ class MachineReadableTravelDocument:
             self.decoded_mrz["expiration_date"] = expiration_date
             self.decoded_mrz["personal_number"] = personal_number
         
+        if as_record:
+            return MRZRecord.from_dict(self.decoded_mrz)
         return self.decoded_mrz
 
+    """
+    Method to decode one MRZ input without touching instance state; unlike decode_mrz_input
+    every call returns a fresh dict, so one instance can be shared between threads
+    @param as_record: return a compact MRZRecord instead of the decoded dict
+    """
+    def decode(self, encoded_mrz: str, as_record: bool = False):
+        if as_record:
+            return MRZRecord.from_dict(self._decode_record(encoded_mrz))
+        return self._decode_record(encoded_mrz)
+
+    """
+    Method to decode many MRZ inputs in a single pass; unlike decode_mrz_input
+    a fresh dict is returned for every record, so results never overwrite each other
+    @param layout: MRZLayout or layout name ("TD1", "TD2", "TD3") to decode with the layout
+    spec engine instead of the TD3 parser
+    @param fields: TD3 field names to project; only those fields are sliced and checked, and
+    a field is left out when its own check digit does not match (see LazyMRZRecord)
+    """
+    def decode_many(self, encoded_mrzs, as_record: bool = False, layout=None, fields=None) -> list:
+        sink = self.instrumentation
+        if fields is not None:
+            if as_record or layout not in (None, "TD3", TD3_LAYOUT):
+                raise Exception("A field projection decodes TD3 records into dicts only")
+            if sink is not None:
+                started = perf_counter_ns()
+            projected = list(map(partial(_project_fields, _field_decoders(fields)), encoded_mrzs))
+            if sink is not None:
+                self._observe("decode_projection", started)
+            return projected
+        if layout is not None:
+            layout = get_layout(layout)
+            if as_record and layout is not TD3_LAYOUT:
+                raise Exception("MRZRecord only holds TD3 fields; the {} layout cannot be decoded as records".format(layout.name))
+            if sink is not None:
+                started = perf_counter_ns()
+            decoded_mrzs = layout.decode_many(encoded_mrzs)
+            if sink is not None:
+                self._observe("layout_decode_many", started)
+            return list(map(MRZRecord.from_dict, decoded_mrzs)) if as_record else decoded_mrzs
+        if as_record:
+            return [MRZRecord.from_dict(self._decode_record(encoded_mrz)) for encoded_mrz in encoded_mrzs]
+        return [self._decode_record(encoded_mrz) for encoded_mrz in encoded_mrzs]
+
+    """
+    Method to decode a large MRZ file or stream lazily, yielding one fresh dict per record
+    so memory stays flat regardless of the input size
+    """
+    def decode_stream(self, source, chunk_size: int = STREAM_CHUNK_SIZE):
+        for encoded_mrz in iter_mrz_records(source, chunk_size=chunk_size):
+            yield self._decode_record(encoded_mrz)
+
+    """
+    helper function to decode a single MRZ input with the precompiled TD3 parser
+    """
+    def _decode_record(self, encoded_mrz: str) -> dict:
+        sink = self.instrumentation
+        if sink is not None:
+            started = perf_counter_ns()
+        match = TD3_PATTERN.fullmatch(encoded_mrz)
+        if match is None:
+            raise Exception("The MRZ input provided cannot be parsed because it does not match the fixed TD3 layout: {}".format(encoded_mrz))
+        fields = match.groupdict()
+
+        # line_1 decoding; names are '<<' separated, only the first two given names are kept
+        last_name, _, given_names = fields['names'].partition('<<')
+        given_names = given_names.split('<')
+        decoded_mrz = {
+            "document_type": fields['document_type'],
+            "issuing_country": fields['issuing_country'],
+            "last_name": last_name,
+            "given_name": ' '.join(given_names[:2]).strip()
+        }
+        if sink is not None:
+            started = self._observe("parse", started)
+
+        # line_2 decoding; the personal number runs up to its '<' filler and, left empty, may
+        # carry '<' as its check digit
+        personal_number = fields['personal_number'].partition('<')[0]
+        personal_number_check_digit = fields['personal_number_check_digit']
+        if (
+            self.generate_check_digit(fields['passport_number']) == int(fields['passport_check_digit']) and
+            self.generate_check_digit(fields['birth_date']) == int(fields['birth_date_check_digit']) and
+            self.generate_check_digit(fields['expiration_date']) == int(fields['expiration_date_check_digit']) and
+            self.generate_check_digit(personal_number) == (0 if personal_number_check_digit == '<' else int(personal_number_check_digit))
+        ):
+            decoded_mrz["passport_number"] = fields['passport_number']
+            decoded_mrz["country_code"] = fields['country_code']
+            decoded_mrz["birth_date"] = fields['birth_date']
+            decoded_mrz["sex"] = fields['sex']
+            decoded_mrz["expiration_date"] = fields['expiration_date']
+            decoded_mrz["personal_number"] = personal_number
+        if sink is not None:
+            self._observe("check_digits", started)
+
+        return decoded_mrz
+
+    """
+    Method to validate the check digits of an MRZ input without decoding or printing;
+    malformed input is reported with the MALFORMED_INPUT flag instead of raising
+    """
+    def validate_mrz_input(self, encoded_mrz: str) -> ValidationResult:
+        match = TD3_PATTERN.fullmatch(encoded_mrz)
+        if match is None:
+            return VALIDATION_RESULTS[MALFORMED_INPUT]
+        fields = match.groupdict()
+        failed = 0
+        if not check_digit_matches(fields['passport_number'], fields['passport_check_digit']):
+            failed |= PASSPORT_NUMBER_INVALID
+        if not check_digit_matches(fields['birth_date'], fields['birth_date_check_digit']):
+            failed |= BIRTH_DATE_INVALID
+        if not check_digit_matches(fields['expiration_date'], fields['expiration_date_check_digit']):
+            failed |= EXPIRATION_DATE_INVALID
+        if not check_digit_matches(fields['personal_number'].partition('<')[0], fields['personal_number_check_digit'], optional=True):
+            failed |= PERSONAL_NUMBER_INVALID
+        return VALIDATION_RESULTS[failed]
+
+    """
+    Method to validate many MRZ inputs, counting the outcome of each in a ValidationSummary
+    @return tuple of the per-record results and the summary
+    """
+    def validate_many(self, encoded_mrzs, summary: ValidationSummary = None) -> tuple:
+        summary = summary if summary is not None else ValidationSummary()
+        results = []
+        for encoded_mrz in encoded_mrzs:
+            result = self.validate_mrz_input(encoded_mrz)
+            summary.add(result)
+            results.append(result)
+        return results, summary
+
     """
     Method to take given JSON payload for passport holder
     and convert it into MRZ compatible format
     """
     def encode_mrz_input(self, decoded_mrz: dict) -> str:
+        self.encoded_mrz = self.encode(decoded_mrz)
+        return self.encoded_mrz
+
+    """
+    Method to encode one JSON payload (or MRZRecord) without touching instance state,
+    so one instance can be shared between threads
+    """
+    def encode(self, decoded_mrz: dict) -> str:
+        if isinstance(decoded_mrz, MRZRecord):
+            decoded_mrz = decoded_mrz.to_encode_dict()
+        sink = self.instrumentation
+        if sink is not None:
+            started = perf_counter_ns()
         # validate dict() input from json file is formatted correctly
         if 'line1' in decoded_mrz and 'line2' in decoded_mrz:
             line_1 = decoded_mrz['line1']
@@ -106,64 +1501,114 @@ class MachineReadableTravelDocument:
             raise Exception(exception_string.format('expiration_date', 2))
         if 'personal_number' not in line_2:
             raise Exception(exception_string.format('personal_number', 2))
+        if sink is not None:
+            started = self._observe("encode_validation", started)
 
-        issuing_country = line_1['issuing_country']
-        last_name = line_1['last_name']
-        given_name = line_1['given_name']
-        passport_number = line_2['passport_number']
+        # fields are padded (the names truncated) to their TD3_LAYOUT width, as encode_many does
+        widths = TD3_LAYOUT.widths
+        issuing_country = pad_field(line_1['issuing_country'], widths['issuing_country'], 'issuing_country')
+        names = pad_names(line_1['last_name'], line_1['given_name'], widths['names'])
+        passport_number = pad_field(line_2['passport_number'], widths['passport_number'], 'passport_number')
         passport_number_check_digit = self.generate_check_digit(passport_number)
-        country_code = line_2['country_code']
-        birth_date = line_2['birth_date']
+        country_code = pad_field(line_2['country_code'], widths['country_code'], 'country_code')
+        birth_date = pad_field(line_2['birth_date'], widths['birth_date'], 'birth_date')
         birth_date_check_digit = self.generate_check_digit(birth_date)
-        sex = line_2['sex']
-        expiration_date = line_2['expiration_date']
+        sex = pad_field(line_2['sex'], widths['sex'], 'sex')
+        expiration_date = pad_field(line_2['expiration_date'], widths['expiration_date'], 'expiration_date')
         expiration_date_check_digit = self.generate_check_digit(expiration_date)
-        personal_number = line_2['personal_number'] if 'personal_number' in line_2 else None
-        personal_number_check_digit = self.generate_check_digit(personal_number) if personal_number is not None else None
-        
-        encoded_line_1 = "P<" + issuing_country.upper() + last_name.upper() + "<<" + given_name.upper().replace(" ", "<")
-        encoded_line_1 += '<' * (MAX_MRZ_LENGTH - len(encoded_line_1))
-        
-        encoded_line_2 = passport_number.upper() + str(passport_number_check_digit) \
-            + country_code.upper() + birth_date + str(birth_date_check_digit) + sex.upper() + expiration_date + str(expiration_date_check_digit)
+        personal_number = line_2['personal_number']
         if personal_number is not None:
-            encoded_line_2 += personal_number.upper()
-            encoded_line_2 += '<' * ((MAX_MRZ_LENGTH - 1) - len(encoded_line_2))
-            encoded_line_2 += str(personal_number_check_digit)
+            personal_number = pad_field(personal_number, widths['personal_number'], 'personal_number')
+            personal_number_check_digit = str(self.generate_check_digit(personal_number))
         else:
-            encoded_line_2 += '<' * (MAX_MRZ_LENGTH - len(encoded_line_2))
+            # a record without personal number is filled up to the full line, '<' standing in for the check digit
+            personal_number = '<' * widths['personal_number']
+            personal_number_check_digit = '<'
+        if sink is not None:
+            started = self._observe("encode_check_digits", started)
 
-        self.encoded_mrz = encoded_line_1 + ';' + encoded_line_2
-        return self.encoded_mrz
+        encoded_line_1 = "P<" + issuing_country + names
+        encoded_line_2 = passport_number + str(passport_number_check_digit) + country_code + birth_date + str(birth_date_check_digit) \
+            + sex + expiration_date + str(expiration_date_check_digit) + personal_number + personal_number_check_digit
+        # the names and country codes are not covered by a check digit, so the ICAO alphabet is checked on the whole record
+        _encode_column(encoded_line_1 + encoded_line_2)
+
+        encoded_mrz = encoded_line_1 + ';' + encoded_line_2
+        if sink is not None:
+            self._observe("encode_assembly", started)
+        return encoded_mrz
+
+    """
+    Method to encode many JSON payloads at once; fields are validated for the whole batch
+    before any line is built and all check digits are generated together per field
+    @param layout: MRZLayout or layout name ("TD1", "TD2", "TD3") to encode with the layout
+    spec engine instead of the TD3 encoder
+    """
+    def encode_many(self, decoded_mrzs, layout=None) -> list:
+        sink = self.instrumentation
+        if layout is not None:
+            layout = get_layout(layout)
+            if sink is not None:
+                started = perf_counter_ns()
+            encoded_mrzs = layout.encode_many(decoded_mrzs)
+            if sink is not None:
+                self._observe("layout_encode_many", started)
+            return encoded_mrzs
+        # the TD3 records are encoded by the TD3 layout, requiring every field like encode_mrz_input
+        observe = None if sink is None else partial(self._observe_prefixed, "encode_many_")
+        return TD3_LAYOUT.encode_many(decoded_mrzs, observe=observe, strict=True)
+
+    """
+    helper function to report a stage of a layout to the instrumentation sink under a prefix
+    """
+    def _observe_prefixed(self, prefix: str, stage: str, started: int) -> int:
+        return self._observe(prefix + stage, started)
+
+    """
+    helper function to raise the same error as encode_mrz_input for the first missing key
+    """
+    def _raise_for_missing_fields(self, decoded_mrz: dict) -> None:
+        if 'line1' not in decoded_mrz or 'line2' not in decoded_mrz:
+            raise KeyError('The decoded MRZ data provided does not contain the key-value pairs expected. Aborting operation.')
+        exception_string = 'The expected field \'{}\' was not found in line {} of the decoded MRZ Input. Aborting operation.'
+        for line_number, fields in ((1, LINE_1_FIELDS), (2, LINE_2_FIELDS)):
+            for field in fields:
+                if field not in decoded_mrz['line{}'.format(line_number)]:
+                    raise Exception(exception_string.format(field, line_number))
 
     """
     helper function to determine validity of provided check digit for a given field
     @param field_identifier: provides useful information about which field the value is coming from
     """
     def is_check_digit_valid(self, field: str, check_digit: int, field_identifier: str) -> bool:
-        valid = self.generate_check_digit(field) == check_digit
+        if self.instrumentation is not None:
+            started = perf_counter_ns()
+            valid = self.generate_check_digit(field) == check_digit
+            self._observe("check_digit:" + field_identifier, started)
+        else:
+            valid = self.generate_check_digit(field) == check_digit
         if not valid:
             print("The check digit ({}) for the field {}, with value {} does not match.\
                  The MRZ for this Travel Document is invalid."\
                 .format(check_digit, field_identifier, field))
         return valid
 
+    """
+    helper function to report the time since started to the instrumentation sink
+    @return the current perf_counter_ns, the start of the next stage
+    """
+    def _observe(self, stage: str, started: int) -> int:
+        now = perf_counter_ns()
+        self.instrumentation.observe(stage, now - started)
+        return now
+
     """
     helper function to generate check digit for a given field
     """
     def generate_check_digit(self, field: str) -> int:
-        total = 0
-        for index, val in enumerate(field):
-            if val not in self.cmap:
-                raise Exception('The provided character {} does not conform to the ICAO standard alpha-numeric character values. \
-                    The MRZ for this Travel Document is invalid.'.format(val))
-            value = self.cmap[val]
-            weight = 0
-            if index % 3 == 0: # weight 7
-                weight = 7
-            elif index % 3 == 1: # weight 3
-                weight = 3
-            elif index % 3 == 2: # weight 1
-                weight = 1
-            total += (value * weight)
-        return total % 10
+        return compute_check_digit(field)
+
+if __name__ == '__main__':
+    # python -m MRTD decode|encode|validate ... runs the bulk command-line tool
+    from MRTDCli import main
+    sys.exit(main())
@@ -0,0 +1,108 @@
+import time
+from collections import OrderedDict
+from MRTD import MachineReadableTravelDocument, MRZRecord
+
+DEFAULT_CAPACITY = 4096
+
+# marks a cache miss, since None could be a stored value
+_MISSING = object()
+
+class LRUCache:
+    """
+    bounded least-recently-used cache with optional time-to-live; entries older than ttl
+    seconds (measured with clock) are dropped on access
+    """
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, ttl: float = None, clock=time.monotonic):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    """
+    Method to look up key, refreshing its recency; returns default on a miss or an expired entry
+    """
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= self.clock():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    """
+    Method to store value under key, evicting the least recently used entries over capacity
+    """
+    def put(self, key, value) -> None:
+        expires_at = self.clock() + self.ttl if self.ttl is not None else None
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "capacity": self.capacity, "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "expirations": self.expirations, "hit_rate": self.hit_rate}
+
+class CachedMRTD:
+    """
+    decode/encode front end for repeat scans: decode results are cached as immutable
+    MRZRecords keyed by the raw MRZ string, encode results by the MRZRecord field tuple
+    """
+    def __init__(self, mrtd: MachineReadableTravelDocument = None, capacity: int = DEFAULT_CAPACITY,
+                 ttl: float = None, clock=time.monotonic):
+        self.mrtd = mrtd if mrtd is not None else MachineReadableTravelDocument()
+        self.decode_cache = LRUCache(capacity, ttl, clock)
+        self.encode_cache = LRUCache(capacity, ttl, clock)
+
+    """
+    Method to decode an MRZ string, reusing the record of an earlier scan of the same string
+    """
+    def decode(self, encoded_mrz: str) -> MRZRecord:
+        record = self.decode_cache.get(encoded_mrz, _MISSING)
+        if record is _MISSING:
+            record = self.mrtd.decode_many([encoded_mrz], as_record=True)[0]
+            self.decode_cache.put(encoded_mrz, record)
+        return record
+
+    """
+    Method to encode a JSON payload or MRZRecord, reusing the MRZ string of identical fields;
+    a payload is checked for missing fields before it is keyed, so it fails like an uncached encode
+    """
+    def encode(self, decoded_mrz) -> str:
+        record = decoded_mrz
+        if not isinstance(record, MRZRecord):
+            self.mrtd._raise_for_missing_fields(decoded_mrz)
+            record = MRZRecord.from_encode_dict(decoded_mrz)
+        encoded_mrz = self.encode_cache.get(record, _MISSING)
+        if encoded_mrz is _MISSING:
+            encoded_mrz = self.mrtd.encode_mrz_input(record)
+            self.encode_cache.put(record, encoded_mrz)
+        return encoded_mrz
+
+    def stats(self) -> dict:
+        return {"decode": self.decode_cache.stats(), "encode": self.encode_cache.stats()}
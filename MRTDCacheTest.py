@@ -0,0 +1,128 @@
+import unittest
+import json
+from MRTD import MachineReadableTravelDocument, MRZRecord
+from MRTDCache import CachedMRTD, LRUCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+class TestLRUCache(unittest.TestCase):
+    """
+    test least recently used entry is evicted once capacity is exceeded
+    """
+    def test_put_evicts_least_recently_used_entry(self):
+        # assemble
+        cache = LRUCache(capacity=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        # act
+        cache.put('c', 3)
+        # assert
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+    """
+    test entries older than the ttl are expired and counted as misses
+    """
+    def test_get_expires_entry_after_ttl(self):
+        # assemble
+        clock = FakeClock()
+        cache = LRUCache(capacity=2, ttl=5, clock=clock)
+        cache.put('a', 1)
+        # act
+        clock.now = 4.9
+        fresh = cache.get('a')
+        clock.now = 5.0
+        expired = cache.get('a')
+        # assert
+        self.assertEqual(fresh, 1)
+        self.assertIsNone(expired)
+        self.assertEqual(cache.expirations, 1)
+        self.assertEqual(len(cache), 0)
+
+    """
+    test cache rejects a capacity below one
+    """
+    def test_cache_raises_value_error_when_capacity_invalid(self):
+        with self.assertRaises(ValueError):
+            LRUCache(capacity=0)
+
+class TestCachedMRTD(unittest.TestCase):
+    """
+    setUp method for the test class; loads the sample records
+    """
+    def setUp(self) -> None:
+        self.cached = CachedMRTD(capacity=8)
+        with open('resources/encoded_3.json', 'r') as file:
+            self.encoded_mrzs = json.load(file).get('records_encoded')
+        with open('resources/decoded_3.json', 'r') as file:
+            self.decoded_mrzs = json.load(file).get('records_decoded')
+        return super().setUp()
+
+    """
+    test repeat scans of the same MRZ return the same immutable record from the cache
+    """
+    def test_decode_returns_cached_immutable_record(self):
+        # act
+        first = self.cached.decode(self.encoded_mrzs[0])
+        second = self.cached.decode(self.encoded_mrzs[0])
+        # assert
+        self.assertIs(first, second)
+        self.assertIsInstance(first, MRZRecord)
+        self.assertEqual(first.last_name, 'LYNN')
+        with self.assertRaises(AttributeError):
+            first.last_name = 'SMITH'
+        self.assertEqual(self.cached.stats()['decode']['hits'], 1)
+        self.assertEqual(self.cached.stats()['decode']['misses'], 1)
+
+    """
+    test encode caches on the field tuple so dict and record inputs share an entry
+    """
+    def test_encode_reuses_entry_for_identical_fields(self):
+        # act
+        from_dict = self.cached.encode(self.decoded_mrzs[1])
+        from_record = self.cached.encode(MRZRecord.from_encode_dict(self.decoded_mrzs[1]))
+        # assert
+        self.assertEqual(from_dict, self.encoded_mrzs[1])
+        self.assertEqual(from_record, from_dict)
+        self.assertEqual(self.cached.encode_cache.hits, 1)
+        self.assertEqual(len(self.cached.encode_cache), 1)
+
+    """
+    test encode of a payload without personal number encodes it as filler, like the uncached encode
+    """
+    def test_encode_accepts_missing_personal_number(self):
+        # assemble
+        decoded_mrz = {"line1": self.decoded_mrzs[0]["line1"], "line2": dict(self.decoded_mrzs[0]["line2"], personal_number=None)}
+        # act
+        encoded_mrz = self.cached.encode(decoded_mrz)
+        # assert
+        self.assertEqual(encoded_mrz, MachineReadableTravelDocument().encode_mrz_input(decoded_mrz))
+        self.assertEqual(self.cached.encode(decoded_mrz), encoded_mrz)
+        self.assertEqual(self.cached.encode_cache.hits, 1)
+
+    """
+    test encode of a malformed payload raises the same exceptions as the uncached encode and caches nothing
+    """
+    def test_encode_raises_exception_for_malformed_payload(self):
+        # assemble
+        without_line_2_field = {"line1": self.decoded_mrzs[0]["line1"], "line2": dict(self.decoded_mrzs[0]["line2"])}
+        del without_line_2_field["line2"]["sex"]
+        # act / assert
+        with self.assertRaisesRegex(KeyError, 'does not contain the key-value pairs expected'):
+            self.cached.encode({"line2": self.decoded_mrzs[0]["line2"]})
+        with self.assertRaisesRegex(Exception, "The expected field 'sex' was not found in line 2"):
+            self.cached.encode(without_line_2_field)
+        self.assertEqual(len(self.cached.encode_cache), 0)
+
+if __name__ == '__main__':
+    print('Running unit tests for CachedMRTD')
+    unittest.main(exit=False, verbosity=2)
@@ -0,0 +1,248 @@
+import sys
+import csv
+import json
+import time
+import argparse
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from MRTD import MachineReadableTravelDocument, TD3_LAYOUT, LAYOUTS, HEADER_FIELD, NAMES_FIELD, OPTIONAL_FIELD
+from MRTD import get_layout, iter_mrz_records, prevalidate_mrz
+
+DEFAULT_BATCH_SIZE = 1000
+# JSON documents keep their records under the same keys as the sample resources
+INPUT_KEYS = {"decode": "records_encoded", "validate": "records_encoded", "encode": "records_decoded"}
+OUTPUT_KEYS = {"decode": "records_decoded", "validate": "records_validated", "encode": "records_encoded"}
+HEADER_FIELDS = ("document_type", "issuing_country", "last_name", "given_name")
+VALIDATION_FIELDS = ("valid", "failed_fields", "reasons")
+FORMATS = ("json", "jsonl", "csv")
+
+# one codec per process; the stateless batch methods are safe to reuse across batches
+MRTD = MachineReadableTravelDocument()
+
+"""
+helper function to list the data fields of a layout, in record order
+"""
+def _data_fields(layout) -> list:
+    return [field for field, _, _, _, role in layout.fields if role not in (HEADER_FIELD, NAMES_FIELD)]
+
+"""
+helper function to check the structure and check digits of one encoded MRZ string (TD3)
+"""
+def _validate(encoded_mrz: str) -> dict:
+    result = MRTD.validate_mrz_input(encoded_mrz)
+    row = {"valid": result.valid, "failed_fields": result.failed_fields}
+    if "malformed" in result.failed_fields:
+        row["reasons"] = list(prevalidate_mrz(encoded_mrz))
+    return row
+
+"""
+worker function to run one command over a batch of records; the fast batch path is tried
+first and a batch holding a bad record is redone one record at a time
+@param layout: layout name, or None for the TD3 codec
+@return list of (result, error message) pairs in input order
+"""
+def run_batch(command: str, layout, records: list) -> list:
+    try:
+        if command == "decode":
+            results = MRTD.decode_many(records, layout=layout)
+        elif command == "encode":
+            results = MRTD.encode_many(records, layout=layout)
+        else:
+            results = list(map(_validate, records))
+        return [(result, None) for result in results]
+    except Exception as ex:
+        if len(records) > 1:
+            return [outcome for record in records for outcome in run_batch(command, layout, [record])]
+        return [(None, "{}: {}".format(type(ex).__name__, ex))]
+
+"""
+helper function to turn a CSV row into an encode payload: header fields go to line1 and every
+other column to line2; empty cells are left out, or kept as None for optional fields
+"""
+def _csv_payload(row: dict, layout) -> dict:
+    optional = {field for field, _, _, _, role in layout.fields if role == OPTIONAL_FIELD}
+    payload = {"line1": {}, "line2": {}}
+    for field, value in row.items():
+        if value or field in optional:
+            payload["line1" if field in HEADER_FIELDS else "line2"][field] = value or None
+    return payload
+
+"""
+helper function to accept the flat dicts written by decode as encode payloads, so the output
+of decode can be piped back into encode
+"""
+def _flat_payload(record):
+    if not isinstance(record, dict) or "line1" in record:
+        return record
+    return {
+        "line1": {field: value for field, value in record.items() if field in HEADER_FIELDS},
+        "line2": {field: value for field, value in record.items() if field not in HEADER_FIELDS}
+    }
+
+"""
+helper function to stream the records of every input (a path or '-' for stdin) in order;
+JSON documents and JSON lines are told apart by iter_mrz_records, CSV needs a header row
+naming an encoded_mrz column (decode, validate) or the payload fields (encode). An input
+that cannot be opened or parsed (invalid JSON or CSV, bytes that are not UTF-8) raises an
+Exception naming the input
+"""
+def iter_input_records(command: str, inputs: list, input_format: str = None, layout=None):
+    for source in inputs:
+        try:
+            yield from _iter_source_records(command, source, input_format, layout)
+        except Exception as ex:
+            raise Exception("The input {} cannot be read: {}".format("<stdin>" if source == "-" else source, ex)) from ex
+
+"""
+helper function to stream the records of one input, see iter_input_records
+"""
+def _iter_source_records(command: str, source: str, input_format: str = None, layout=None):
+    source_format = input_format or ("csv" if source.lower().endswith(".csv") else "json")
+    stream = sys.stdin.buffer if source == "-" else open(source, "rb")
+    try:
+        if source_format != "csv":
+            records = iter_mrz_records(stream, key=INPUT_KEYS[command])
+            yield from map(_flat_payload, records) if command == "encode" else records
+            return
+        rows = csv.DictReader(line.decode("utf-8") for line in stream)
+        if command == "encode":
+            spec = get_layout(layout) if layout is not None else TD3_LAYOUT
+            for row in rows:
+                yield _csv_payload(row, spec)
+            return
+        if "encoded_mrz" not in (rows.fieldnames or ()):
+            raise Exception("no encoded_mrz column")
+        for row in rows:
+            yield row["encoded_mrz"]
+    finally:
+        if stream is not sys.stdin.buffer:
+            stream.close()
+
+class OutputWriter:
+    """
+    incremental writer of command results as JSON lines, a streamed JSON document
+    ({"<key>": [...]}) or CSV with the given columns
+    """
+    def __init__(self, stream, output_format: str, key: str, columns: list):
+        self.stream = stream
+        self.output_format = output_format
+        self.key = key
+        self.count = 0
+        if output_format == "csv":
+            self._csv = csv.DictWriter(stream, columns, extrasaction="ignore", lineterminator="\n")
+            self._csv.writeheader()
+            self._columns = columns
+        elif output_format == "json":
+            stream.write('{{"{}": ['.format(key))
+
+    def write(self, result) -> None:
+        if self.output_format == "csv":
+            if not isinstance(result, dict):
+                result = {self._columns[0]: result}
+            self._csv.writerow({field: '|'.join(value) if isinstance(value, list) else value for field, value in result.items()})
+        elif self.output_format == "json":
+            self.stream.write((",\n" if self.count else "\n") + json.dumps(result))
+        else:
+            self.stream.write(json.dumps(result) + "\n")
+        self.count += 1
+
+    def close(self) -> None:
+        if self.output_format == "json":
+            self.stream.write("\n]}\n")
+        self.stream.flush()
+
+"""
+helper function to run the command over the records in batches, on a process pool when
+workers > 1; at most two batches per worker are in flight so memory stays bounded and
+results come back in input order as soon as each batch is done
+"""
+def iter_outcomes(command: str, records, layout=None, workers: int = 1, batch_size: int = DEFAULT_BATCH_SIZE):
+    batches = iter(lambda: list(islice(records, batch_size)), [])
+    if workers <= 1:
+        for batch in batches:
+            yield from run_batch(command, layout, batch)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.submit(run_batch, command, layout, batch))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m MRTD", description="Bulk encode, decode and validate machine readable zones")
+    parser.add_argument("command", choices=("decode", "encode", "validate"))
+    parser.add_argument("inputs", nargs="*", default=["-"], help="input files, '-' for stdin (the default)")
+    parser.add_argument("-o", "--output", default="-", help="output file, '-' for stdout (the default)")
+    parser.add_argument("--input-format", choices=("json", "csv"),
+                        help="input format; JSON documents and JSON lines are detected, CSV is chosen by the .csv extension")
+    parser.add_argument("--output-format", choices=FORMATS, help="output format, by default from the output extension or jsonl")
+    parser.add_argument("--layout", choices=sorted(LAYOUTS), help="document layout for the layout spec engine; TD3 codec by default")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (default 1, no pool)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="records per batch (default %(default)s)")
+    parser.add_argument("--stats", action="store_true", help="print throughput and error counts as JSON to stderr")
+    return parser
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
+    if args.command == "validate" and args.layout not in (None, "TD3"):
+        parser.error("validate supports the TD3 layout only")
+    output_format = args.output_format or next(
+        (output_format for output_format in FORMATS if args.output.lower().endswith("." + output_format)), "jsonl")
+    layout = get_layout(args.layout) if args.layout is not None else TD3_LAYOUT
+    columns = {
+        "decode": list(HEADER_FIELDS) + _data_fields(layout),
+        "encode": ["encoded_mrz"],
+        "validate": list(VALIDATION_FIELDS)
+    }[args.command]
+
+    stream = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    writer = OutputWriter(stream, output_format, OUTPUT_KEYS[args.command], columns)
+    records = iter_input_records(args.command, args.inputs, args.input_format, args.layout)
+    errors = 0
+    invalid = 0
+    field_failures = Counter()
+    failure = None
+    started = time.perf_counter()
+    try:
+        for index, (result, error) in enumerate(iter_outcomes(args.command, records, args.layout, args.workers, args.batch_size)):
+            if error is not None:
+                errors += 1
+                print("record {}: {}".format(index, error), file=sys.stderr)
+                continue
+            if args.command == "validate" and not result["valid"]:
+                invalid += 1
+                field_failures.update(result["failed_fields"])
+            elif args.command == "decode" and "birth_date" not in result:
+                # a failed check digit leaves the data fields out of the decoded record
+                invalid += 1
+            writer.write(result)
+    except Exception as ex:
+        # an unreadable input stops the run; the records written so far are kept
+        failure = ex
+    finally:
+        writer.close()
+        if stream is not sys.stdout:
+            stream.close()
+    elapsed = time.perf_counter() - started
+    if failure is not None:
+        print("error: {}".format(failure), file=sys.stderr)
+        return 2
+
+    if args.stats:
+        total = writer.count + errors
+        stats = {"command": args.command, "records": total, "written": writer.count, "errors": errors, "invalid": invalid,
+                 "seconds": round(elapsed, 6), "records_per_sec": round(total / elapsed, 1) if elapsed else None}
+        if args.command == "validate":
+            stats["field_failures"] = dict(field_failures)
+        print(json.dumps(stats), file=sys.stderr)
+    return 1 if errors else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
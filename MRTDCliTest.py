@@ -0,0 +1,110 @@
+import unittest
+import contextlib
+import io
+import json
+import os
+import tempfile
+from MRTDCli import main
+
+class TestMRTDCli(unittest.TestCase):
+    """
+    setUp method for the test class; creates a temporary directory for inputs and outputs
+    """
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        with open('resources/records_encoded.json', 'r') as file:
+            self.encoded_mrzs = json.load(file).get('records_encoded')[:300]
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+        return super().tearDown()
+
+    """
+    helper function to run the tool and capture its exit status, stdout and stderr
+    """
+    def run_cli(self, *argv) -> tuple:
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            status = main(list(argv))
+        return status, stdout.getvalue(), stderr.getvalue()
+
+    """
+    test decode output piped back into encode reproduces the input, on one process and on a pool
+    """
+    def test_decode_encode_round_trip(self):
+        # assemble
+        decoded_path = os.path.join(self.directory.name, 'decoded.jsonl')
+        # act
+        status, _, stderr = self.run_cli('decode', 'resources/records_encoded.json', '-o', decoded_path, '--stats')
+        _, encoded, _ = self.run_cli('encode', decoded_path, '--output-format', 'json')
+        _, pooled, _ = self.run_cli('encode', decoded_path, '--output-format', 'json', '--workers', '2', '--batch-size', '700')
+        # assert
+        self.assertEqual(status, 0)
+        stats = json.loads(stderr)
+        self.assertEqual((stats['records'], stats['errors'], stats['invalid']), (10000, 0, 0))
+        self.assertEqual(json.loads(encoded)['records_encoded'][:300], self.encoded_mrzs)
+        self.assertEqual(pooled, encoded)
+
+    """
+    test a bad CSV record is reported on stderr and the exit status while the rest are written
+    """
+    def test_csv_input_reports_bad_records(self):
+        # assemble
+        csv_path = os.path.join(self.directory.name, 'scans.csv')
+        with open(csv_path, 'w') as file:
+            file.write('encoded_mrz\n' + '\n'.join(self.encoded_mrzs[:2] + ['P<CIVLYNN<<NEVEAH'] + self.encoded_mrzs[2:3]) + '\n')
+        # act
+        status, output, stderr = self.run_cli('decode', csv_path, '--output-format', 'csv', '--batch-size', '2')
+        # assert
+        self.assertEqual(status, 1)
+        self.assertIn('record 2: Exception:', stderr)
+        lines = output.splitlines()
+        self.assertEqual(lines[0], 'document_type,issuing_country,last_name,given_name,passport_number,country_code,birth_date,sex,expiration_date,personal_number')
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(lines[1], 'P,CIV,LYNN,NEVEAH BRAM,W620126G5,CIV,591010,F,970730,AJ010215I')
+
+    """
+    test validate explains malformed records and counts field failures
+    """
+    def test_validate_reports_reasons_and_stats(self):
+        # assemble
+        jsonl_path = os.path.join(self.directory.name, 'scans.jsonl')
+        corrupted = self.encoded_mrzs[0][:54] + str((int(self.encoded_mrzs[0][54]) + 1) % 10) + self.encoded_mrzs[0][55:]
+        with open(jsonl_path, 'w') as file:
+            file.write('\n'.join(json.dumps(encoded_mrz) for encoded_mrz in (corrupted, self.encoded_mrzs[1], 'P<CIV')) + '\n')
+        # act
+        status, output, stderr = self.run_cli('validate', jsonl_path, '--stats')
+        # assert
+        self.assertEqual(status, 0)
+        self.assertEqual([json.loads(line) for line in output.splitlines()], [
+            {"valid": False, "failed_fields": ["passport_number"]},
+            {"valid": True, "failed_fields": []},
+            {"valid": False, "failed_fields": ["malformed"], "reasons": ["expected 89 characters, got 5"]}
+        ])
+        stats = json.loads(stderr)
+        self.assertEqual((stats['invalid'], stats['field_failures']), (2, {"passport_number": 1, "malformed": 1}))
+
+    """
+    test malformed JSON and CSV input stops the run with a one-line error and a non-zero status
+    """
+    def test_malformed_input_reports_one_line_error(self):
+        # assemble
+        json_path = os.path.join(self.directory.name, 'broken.json')
+        with open(json_path, 'w') as file:
+            file.write('{"records_encoded": ["' + self.encoded_mrzs[0] + '", oops]}')
+        csv_path = os.path.join(self.directory.name, 'broken.csv')
+        with open(csv_path, 'wb') as file:
+            file.write(b'encoded_mrz\n' + self.encoded_mrzs[0].encode('ascii') + b'\n\xff\xfe\n')
+        for path in (json_path, csv_path, os.path.join(self.directory.name, 'missing.json')):
+            # act
+            status, _, stderr = self.run_cli('decode', path)
+            # assert
+            self.assertEqual(status, 2)
+            self.assertEqual(len(stderr.splitlines()), 1)
+            self.assertTrue(stderr.startswith('error: The input {} cannot be read: '.format(path)))
+
+if __name__ == '__main__':
+    print('Running unit tests for the MRTD command-line tool')
+    unittest.main(exit=False, verbosity=2)
@@ -0,0 +1,283 @@
+import struct
+from array import array
+from hashlib import blake2b
+from bisect import bisect_left
+from heapq import merge
+from operator import itemgetter
+from typing import NamedTuple
+from MRTD import MachineReadableTravelDocument, MRZArchive, MRZRecord, TD3_LAYOUT, ARCHIVE_MAGIC, get_layout, iter_mrz_records
+
+FINGERPRINT_MAGIC = b'MRZF'
+FINGERPRINT_VERSION = 1
+FINGERPRINT_HEADER = struct.Struct('<4sHHQ')  # magic, version, reserved, record count
+DEFAULT_BATCH_SIZE = 10000
+# keys identify a document; at 64 bits a batch of ten million documents has a key collision
+# probability of about 3e-6
+FINGERPRINT_SIZE = 8
+# build sorts the (key, position) pairs in runs of this many records, so only one run is ever
+# held as Python tuples
+SORT_RUN_SIZE = 1 << 16
+LINE_SEPARATORS = str.maketrans('', '', ';\n\r')
+
+"""
+helper function to find the record positions (with the line separators removed) of the
+fields identifying a document: its issuing country and passport or document number
+"""
+def _key_slices(layout) -> tuple:
+    slices = {}
+    for field, line, offset, width, _ in layout.fields:
+        start = line * layout.line_length + offset
+        slices[field] = slice(start, start + width)
+    number_field = 'passport_number' if 'passport_number' in slices else 'document_number'
+    return slices['issuing_country'], slices[number_field]
+
+"""
+helper function to normalize an encoded MRZ string: surrounding whitespace and the line
+separators are dropped and letters upper-cased, so the same document scanned with ';' or
+newline separators fingerprints the same
+"""
+def normalize_mrz(encoded_mrz: str) -> bytes:
+    return encoded_mrz.strip().upper().translate(LINE_SEPARATORS).encode('ascii', 'replace')
+
+"""
+Method to compute the 64-bit (key, content) fingerprints of one normalized record; the key
+covers the issuing country and document number, the content the whole record
+"""
+def fingerprint(normalized, key_slices: tuple = _key_slices(TD3_LAYOUT)) -> tuple:
+    key = blake2b(digest_size=FINGERPRINT_SIZE)
+    for key_slice in key_slices:
+        key.update(normalized[key_slice])
+    return (int.from_bytes(key.digest(), 'little'),
+            int.from_bytes(blake2b(normalized, digest_size=FINGERPRINT_SIZE).digest(), 'little'))
+
+"""
+helper function to read normalized records from an MRZArchive or its path, a JSON/JSON lines
+file of encoded strings, or an iterable of encoded strings, decoded dicts, encode payloads
+or MRZRecords (which are normalized by encoding them with the given layout); a record that
+cannot be encoded is yielded as None
+"""
+def _iter_normalized(source, layout, batch_size: int):
+    if isinstance(source, MRZArchive):
+        yield from _iter_archive(source)
+        return
+    if isinstance(source, (str, bytes)) or hasattr(source, '__fspath__'):
+        with open(source, 'rb') as file:
+            is_archive = file.read(len(ARCHIVE_MAGIC)) == ARCHIVE_MAGIC
+        if is_archive:
+            with MRZArchive(source) as archive:
+                yield from _iter_archive(archive)
+            return
+        source = iter_mrz_records(source)
+    mrtd = MachineReadableTravelDocument()
+    batch = []
+    for record in source:
+        if isinstance(record, str):
+            yield normalize_mrz(record)
+            continue
+        if isinstance(record, dict) and 'line1' not in record:
+            record = MRZRecord.from_dict(record)
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield from _encode_normalized(mrtd, batch, layout)
+            batch = []
+    if batch:
+        yield from _encode_normalized(mrtd, batch, layout)
+
+"""
+helper function to encode and normalize a batch of records; one record failing to encode (a
+missing field, such as the line 2 fields a failed check digit drops, or a field too long for
+the layout) fails encode_many for the whole batch, which is then encoded record by record
+with None yielded for each failing record
+"""
+def _encode_normalized(mrtd: MachineReadableTravelDocument, batch: list, layout):
+    try:
+        encoded_mrzs = mrtd.encode_many(batch, layout=layout)
+    except Exception:
+        encoded_mrzs = None
+    if encoded_mrzs is not None:
+        yield from map(normalize_mrz, encoded_mrzs)
+        return
+    for record in batch:
+        try:
+            encoded_mrz = mrtd.encode_many([record], layout=layout)[0]
+        except Exception:
+            yield None
+            continue
+        yield normalize_mrz(encoded_mrz)
+
+"""
+helper function to yield zero-copy views of the archive records, which are already
+normalized; each view is released once the caller has hashed it
+"""
+def _iter_archive(archive: MRZArchive):
+    for index in range(len(archive)):
+        record = archive.record(index)
+        yield record
+        record.release()
+
+class FingerprintIndex:
+    """
+    array-backed index of one batch of MRZ records: per record a 64-bit key fingerprint, a
+    64-bit content fingerprint and its position in the batch, sorted by key so lookups are
+    a bisect and two batches diff in one merge pass; the index holds 24 bytes per record
+    whatever the record size, and building it peaks at about 50. Later records repeating a
+    key are left out and listed in duplicates, records that cannot be encoded are left out
+    and listed in skipped.
+    """
+    def __init__(self, keys: array, contents: array, positions: array, duplicates: array = None, skipped: array = None):
+        self.keys = keys
+        self.contents = contents
+        self.positions = positions
+        self.duplicates = duplicates if duplicates is not None else array('Q')
+        self.skipped = skipped if skipped is not None else array('Q')
+
+    """
+    Method to fingerprint every record of a batch (see _iter_normalized for the sources accepted)
+    @param layout: MRZLayout or layout name of the records, TD3 by default
+    """
+    @classmethod
+    def build(cls, source, layout=TD3_LAYOUT, batch_size: int = DEFAULT_BATCH_SIZE) -> 'FingerprintIndex':
+        key_slices = _key_slices(get_layout(layout))
+        keys = array('Q')
+        contents = array('Q')
+        skipped = array('Q')
+        # batch positions of the fingerprinted records, only kept once a record has been skipped
+        sources = None
+        for position, normalized in enumerate(_iter_normalized(source, layout, batch_size)):
+            if normalized is None:
+                if sources is None:
+                    sources = array('Q', range(position))
+                skipped.append(position)
+                continue
+            key, content = fingerprint(normalized, key_slices)
+            keys.append(key)
+            contents.append(content)
+            if sources is not None:
+                sources.append(position)
+
+        # sort the (key, index) pairs run by run into arrays, then merge the runs; equal keys
+        # come out in batch order, so the first record of a key is the one kept
+        runs = []
+        for start in range(0, len(keys), SORT_RUN_SIZE):
+            run = sorted(zip(keys[start:start + SORT_RUN_SIZE], range(start, start + SORT_RUN_SIZE)))
+            runs.append((array('Q', map(itemgetter(0), run)), array('Q', map(itemgetter(1), run))))
+        del keys
+        sorted_keys = array('Q')
+        sorted_contents = array('Q')
+        positions = array('Q')
+        duplicates = array('Q')
+        previous = None
+        for key, index in merge(*(zip(run_keys, run_indexes) for run_keys, run_indexes in runs)):
+            position = index if sources is None else sources[index]
+            if key == previous:
+                duplicates.append(position)
+                continue
+            previous = key
+            sorted_keys.append(key)
+            sorted_contents.append(contents[index])
+            positions.append(position)
+        return cls(sorted_keys, sorted_contents, positions, array('Q', sorted(duplicates)), skipped)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    """
+    Method to find the batch position of the record with the same key as the given one
+    @return the position, or None when the document is not in the batch
+    """
+    def position(self, encoded_mrz: str, layout=TD3_LAYOUT):
+        key, _ = fingerprint(normalize_mrz(encoded_mrz), _key_slices(get_layout(layout)))
+        index = bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            return self.positions[index]
+        return None
+
+    def __contains__(self, encoded_mrz: str) -> bool:
+        return self.position(encoded_mrz) is not None
+
+    """
+    Method to save the index so the next run can diff against it without re-reading the batch
+    """
+    def save(self, path) -> None:
+        with open(path, 'wb') as file:
+            file.write(FINGERPRINT_HEADER.pack(FINGERPRINT_MAGIC, FINGERPRINT_VERSION, 0, len(self)))
+            for values in (self.keys, self.contents, self.positions):
+                values.tofile(file)
+
+    @classmethod
+    def load(cls, path) -> 'FingerprintIndex':
+        with open(path, 'rb') as file:
+            magic, version, _, count = FINGERPRINT_HEADER.unpack(file.read(FINGERPRINT_HEADER.size))
+            if magic != FINGERPRINT_MAGIC or version != FINGERPRINT_VERSION:
+                raise Exception("The file provided is not a version {} MRZ fingerprint index".format(FINGERPRINT_VERSION))
+            values = []
+            for _ in range(3):
+                column = array('Q')
+                try:
+                    column.fromfile(file, count)
+                except EOFError:
+                    raise Exception("The MRZ fingerprint index is truncated: expected {} records".format(count))
+                values.append(column)
+        return cls(*values)
+
+class FingerprintDiff(NamedTuple):
+    """
+    batch positions of the documents only in the new batch (new), in both batches with
+    different content (changed, new batch positions) and only in the old batch (removed,
+    old batch positions), each in ascending order
+    """
+    new: list
+    changed: list
+    removed: list
+    unchanged: int
+
+"""
+Method to diff two fingerprinted batches with one merge pass over their sorted keys
+"""
+def diff_indexes(old: FingerprintIndex, new: FingerprintIndex) -> FingerprintDiff:
+    added = []
+    changed = []
+    removed = []
+    unchanged = 0
+    old_keys, new_keys = old.keys, new.keys
+    old_count, new_count = len(old_keys), len(new_keys)
+    old_index = new_index = 0
+    while old_index < old_count and new_index < new_count:
+        old_key = old_keys[old_index]
+        new_key = new_keys[new_index]
+        if old_key == new_key:
+            if old.contents[old_index] == new.contents[new_index]:
+                unchanged += 1
+            else:
+                changed.append(new.positions[new_index])
+            old_index += 1
+            new_index += 1
+        elif old_key < new_key:
+            removed.append(old.positions[old_index])
+            old_index += 1
+        else:
+            added.append(new.positions[new_index])
+            new_index += 1
+    removed.extend(old.positions[old_index:])
+    added.extend(new.positions[new_index:])
+    added.sort()
+    changed.sort()
+    removed.sort()
+    return FingerprintDiff(added, changed, removed, unchanged)
+
+"""
+Method to diff two batches given as anything FingerprintIndex.build accepts, or as indexes
+"""
+def diff_batches(old, new, layout=TD3_LAYOUT) -> FingerprintDiff:
+    if not isinstance(old, FingerprintIndex):
+        old = FingerprintIndex.build(old, layout)
+    if not isinstance(new, FingerprintIndex):
+        new = FingerprintIndex.build(new, layout)
+    return diff_indexes(old, new)
+
+"""
+Method to drop repeated documents from a batch, keeping the first record of each key
+@return list of the batch positions kept, in ascending order
+"""
+def deduplicate(source, layout=TD3_LAYOUT) -> list:
+    return sorted(FingerprintIndex.build(source, layout).positions)
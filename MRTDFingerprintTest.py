@@ -0,0 +1,105 @@
+import unittest
+import json
+import os
+import tempfile
+from unittest.mock import patch
+from MRTD import MachineReadableTravelDocument, convert_json_to_archive
+from MRTDFingerprint import FingerprintIndex, FingerprintDiff, deduplicate, diff_batches, diff_indexes
+
+class TestFingerprintIndex(unittest.TestCase):
+    """
+    setUp method for the test class; loads a slice of the sample records
+    """
+    def setUp(self) -> None:
+        with open('resources/records_encoded.json', 'r') as file:
+            self.encoded_mrzs = json.load(file).get('records_encoded')[:1000]
+        return super().setUp()
+
+    """
+    test the diff reports new, changed and removed documents by their batch positions
+    """
+    def test_diff_batches_reports_new_changed_removed(self):
+        # assemble
+        yesterday = self.encoded_mrzs[:900]
+        today = self.encoded_mrzs[50:]
+        # a renewed passport keeps its number but gets a new expiration date
+        today[10] = today[10][:66] + '991231' + today[10][72:]
+        # act
+        diff = diff_batches(yesterday, today)
+        # assert
+        self.assertEqual(diff, FingerprintDiff(new=list(range(850, 950)), changed=[10], removed=list(range(50)), unchanged=849))
+
+    """
+    test fingerprints ignore separators, case and whitespace, and decoded records match their encoded strings
+    """
+    def test_equivalent_inputs_share_fingerprints(self):
+        # assemble
+        variants = [' ' + encoded_mrz.replace(';', '\n').lower() + '\r\n' for encoded_mrz in self.encoded_mrzs]
+        decoded = MachineReadableTravelDocument().decode_many(self.encoded_mrzs)
+        index = FingerprintIndex.build(self.encoded_mrzs)
+        # act / assert
+        self.assertEqual(diff_indexes(index, FingerprintIndex.build(variants)).unchanged, 1000)
+        self.assertEqual(diff_indexes(index, FingerprintIndex.build(decoded)).unchanged, 1000)
+        self.assertEqual(index.position(self.encoded_mrzs[123]), 123)
+        self.assertNotIn('P<UTOERIKSSON<<ANNA<<<<<<<<<<<<<<<<<<<<<<<<<;L898902C36UTO7408122F1204159ZE184226B<<<<<<1', index)
+
+    """
+    test archives and saved indexes diff like the JSON batch they came from
+    """
+    def test_archive_and_saved_index_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # assemble
+            archive_path = os.path.join(directory, 'records.mrza')
+            index_path = os.path.join(directory, 'records.mrzf')
+            convert_json_to_archive('resources/records_encoded.json', archive_path)
+            # act
+            FingerprintIndex.build(archive_path).save(index_path)
+            diff = diff_batches(FingerprintIndex.load(index_path), 'resources/records_encoded.json')
+            # assert
+            self.assertEqual((diff.new, diff.changed, diff.removed, diff.unchanged), ([], [], [], 10000))
+
+    """
+    test deduplicate keeps the first record of each document
+    """
+    def test_deduplicate_keeps_first_occurrence(self):
+        # assemble
+        batch = self.encoded_mrzs[:5] + self.encoded_mrzs[2:4] + self.encoded_mrzs[5:7]
+        # act
+        kept = deduplicate(batch)
+        # assert
+        self.assertEqual(kept, [0, 1, 2, 3, 4, 7, 8])
+        self.assertEqual(list(FingerprintIndex.build(batch).duplicates), [5, 6])
+
+    """
+    test a record that cannot be encoded is skipped and reported instead of failing the build
+    """
+    def test_build_skips_records_that_cannot_be_encoded(self):
+        # assemble
+        corrupted = self.encoded_mrzs[3][:54] + str((int(self.encoded_mrzs[3][54]) + 1) % 10) + self.encoded_mrzs[3][55:]
+        # the failed check digit drops the line 2 fields, so the decoded record cannot be encoded
+        decoded = MachineReadableTravelDocument().decode_many(self.encoded_mrzs[:3] + [corrupted] + self.encoded_mrzs[4:10])
+        # act
+        index = FingerprintIndex.build(decoded, batch_size=4)
+        # assert
+        self.assertEqual(list(index.skipped), [3])
+        self.assertEqual(sorted(index.positions), [0, 1, 2, 4, 5, 6, 7, 8, 9])
+        self.assertEqual(index.position(self.encoded_mrzs[7]), 7)
+
+    """
+    test records sorted in several runs keep their positions and the first record of each key
+    """
+    def test_build_merges_sorted_runs(self):
+        # assemble
+        batch = self.encoded_mrzs + self.encoded_mrzs[:10]
+        # act
+        with patch('MRTDFingerprint.SORT_RUN_SIZE', 64):
+            index = FingerprintIndex.build(batch)
+        # assert
+        self.assertEqual(list(index.keys), sorted(index.keys))
+        self.assertEqual(list(index.duplicates), list(range(1000, 1010)))
+        self.assertEqual(diff_indexes(index, FingerprintIndex.build(self.encoded_mrzs)).unchanged, 1000)
+        self.assertEqual(index.position(self.encoded_mrzs[999]), 999)
+
+if __name__ == '__main__':
+    print('Running unit tests for FingerprintIndex')
+    unittest.main(exit=False, verbosity=2)
@@ -0,0 +1,123 @@
+from typing import NamedTuple
+from MRTD import MAX_MRZ_LENGTH, CHARACTER_CLASSES, POSITION_ALLOWED, POSITION_FIELDS, TD3_LAYOUT
+from MRTD import check_digit_matches
+
+# a scanner may end line 1 with ';' or a newline; carriage returns are dropped
+LINE_SEPARATORS = frozenset(';\n')
+IGNORED_CHARACTERS = frozenset('\r')
+
+# (end position, field, offset, width, check digit offset) of the TD3 fields, in the order they
+# complete; positions count both lines and the separator, as in TD3_LAYOUT.field_positions
+TD3_FIELD_SCHEDULE = tuple(sorted(
+    (field_slice.stop if check_position is None else check_position + 1, field, field_slice.start,
+     field_slice.stop - field_slice.start, check_position)
+    for field, field_slice, check_position in TD3_LAYOUT.field_positions
+))
+
+FIELD = "field"
+REJECTED = "rejected"
+COMPLETE = "complete"
+
+class MRZEvent(NamedTuple):
+    """
+    one step of an incremental decode: a FIELD event carries a decoded field and its value,
+    REJECTED names the offending field with the reason as value, and COMPLETE carries the
+    decoded dict (the same dict MachineReadableTravelDocument.decode returns)
+    """
+    kind: str
+    field: str = None
+    value: object = None
+
+class IncrementalMRZDecoder:
+    """
+    decoder for MRZ text arriving in fragments (line by line or in OCR chunks); every
+    character is checked against its position as it arrives and each field is decoded,
+    with its check digit, as soon as its last character is in, so a bad read is rejected
+    before the scan finishes. Once a scan is complete or rejected further input is ignored
+    until reset() is called.
+    """
+    def __init__(self):
+        self.reset()
+
+    """
+    Method to discard the current scan and start a new one
+    """
+    def reset(self) -> None:
+        self._characters = []
+        self._next_field = 0
+        self.decoded_mrz = {}
+        self.rejected = None
+        self.complete = False
+
+    """
+    Method to consume the next fragment of the scan
+    @return list of the MRZEvents the fragment produced, in order
+    """
+    def feed(self, chunk: str) -> list:
+        events = []
+        characters = self._characters
+        for character in chunk:
+            if self.complete or self.rejected is not None:
+                break
+            if character in IGNORED_CHARACTERS:
+                continue
+            position = len(characters)
+            if position == MAX_MRZ_LENGTH:
+                characters.append(';')
+                if character in LINE_SEPARATORS:
+                    continue
+                # no separator from the scanner; line 2 starts straight after 44 characters
+                position += 1
+            elif character in LINE_SEPARATORS:
+                if position < MAX_MRZ_LENGTH:
+                    reason = "line 1 ended after {} of {} characters".format(position, MAX_MRZ_LENGTH)
+                else:
+                    reason = "unexpected line separator at position {}".format(position)
+                self._reject(events, POSITION_FIELDS[position], reason)
+                break
+            code = ord(character)
+            if code > 0xFF or not CHARACTER_CLASSES[code] & POSITION_ALLOWED[position]:
+                self._reject(events, POSITION_FIELDS[position],
+                             "unexpected character {!r} at position {} ({})".format(character, position, POSITION_FIELDS[position]))
+                break
+            characters.append(character)
+            if position == TD3_FIELD_SCHEDULE[self._next_field][0] - 1:
+                self._decode_field(events)
+            elif MAX_MRZ_LENGTH > position > 5 and 'last_name' not in self.decoded_mrz and character == '<' == characters[-2]:
+                # the surname ends at the first '<<', well before line 1 is complete
+                self._emit(events, "last_name", ''.join(characters[5:position - 1]))
+        return events
+
+    """
+    helper function to decode the field completed by the latest character
+    """
+    def _decode_field(self, events: list) -> None:
+        _, field, offset, width, check_digit_offset = TD3_FIELD_SCHEDULE[self._next_field]
+        self._next_field += 1
+        value = ''.join(self._characters[offset:offset + width])
+        if field == "names":
+            last_name, _, given_names = value.partition('<<')
+            if 'last_name' not in self.decoded_mrz:
+                self._emit(events, "last_name", last_name)
+            self._emit(events, "given_name", ' '.join(given_names.split('<')[:2]).strip())
+            return
+        optional = field in TD3_LAYOUT.optional_fields
+        if optional:
+            # an optional field such as the personal number runs up to its '<' filler
+            value = value.partition('<')[0]
+        if check_digit_offset is not None and not check_digit_matches(value, self._characters[check_digit_offset], optional):
+            self._reject(events, field, "the check digit ({}) for the field {}, with value {} does not match".format(
+                self._characters[check_digit_offset], field, value))
+            return
+        self._emit(events, field, value)
+        if self._next_field == len(TD3_FIELD_SCHEDULE):
+            self.complete = True
+            events.append(MRZEvent(COMPLETE, None, dict(self.decoded_mrz)))
+
+    def _emit(self, events: list, field: str, value: str) -> None:
+        self.decoded_mrz[field] = value
+        events.append(MRZEvent(FIELD, field, value))
+
+    def _reject(self, events: list, field: str, reason: str) -> None:
+        self.rejected = reason
+        events.append(MRZEvent(REJECTED, field, reason))
@@ -0,0 +1,112 @@
+import unittest
+import json
+import random
+from MRTD import MachineReadableTravelDocument
+from MRTDIncremental import IncrementalMRZDecoder, MRZEvent, FIELD, REJECTED, COMPLETE
+
+class TestIncrementalMRZDecoder(unittest.TestCase):
+    """
+    setUp method for the test class; loads a slice of the sample records
+    """
+    def setUp(self) -> None:
+        with open('resources/records_encoded.json', 'r') as file:
+            self.encoded_mrzs = json.load(file).get('records_encoded')[:200]
+        self.decoder = IncrementalMRZDecoder()
+        return super().setUp()
+
+    """
+    test records fed in random fragments, with any line separator, decode like the full record
+    """
+    def test_fragments_decode_like_full_record(self):
+        # assemble
+        mrtd = MachineReadableTravelDocument()
+        fragments = random.Random(7)
+        for index, encoded_mrz in enumerate(self.encoded_mrzs):
+            scan = encoded_mrz.replace(';', ('\n', '\r\n', '', ';')[index % 4])
+            self.decoder.reset()
+            events = []
+            # act
+            position = 0
+            while position < len(scan):
+                step = fragments.randint(1, 12)
+                events.extend(self.decoder.feed(scan[position:position + step]))
+                position += step
+            # assert
+            self.assertTrue(self.decoder.complete)
+            self.assertEqual(events[-1], MRZEvent(COMPLETE, None, mrtd.decode(encoded_mrz)))
+            self.assertEqual([event.field for event in events[:-1]],
+                             ['document_type', 'issuing_country', 'last_name', 'given_name', 'passport_number',
+                              'country_code', 'birth_date', 'sex', 'expiration_date', 'personal_number'])
+
+    """
+    test fields are emitted as soon as their characters arrive, before the line is complete
+    """
+    def test_fields_are_emitted_early(self):
+        # assemble
+        encoded_mrz = self.encoded_mrzs[0]
+        # act
+        first = self.decoder.feed(encoded_mrz[:12])
+        line_1 = self.decoder.feed(encoded_mrz[12:45])
+        passport = self.decoder.feed(encoded_mrz[45:55])
+        # assert
+        self.assertEqual(first, [MRZEvent(FIELD, 'document_type', 'P'), MRZEvent(FIELD, 'issuing_country', 'CIV'),
+                                 MRZEvent(FIELD, 'last_name', 'LYNN')])
+        self.assertEqual(line_1, [MRZEvent(FIELD, 'given_name', 'NEVEAH BRAM')])
+        self.assertEqual(passport, [MRZEvent(FIELD, 'passport_number', 'W620126G5')])
+        self.assertFalse(self.decoder.complete)
+
+    """
+    test the first bad check digit rejects the scan at once and later fragments are ignored
+    """
+    def test_bad_check_digit_rejects_early(self):
+        # assemble
+        encoded_mrz = self.encoded_mrzs[0]
+        corrupted = encoded_mrz[:54] + str((int(encoded_mrz[54]) + 1) % 10) + encoded_mrz[55:]
+        # act
+        events = self.decoder.feed(corrupted[:55])
+        ignored = self.decoder.feed(corrupted[55:])
+        # assert
+        self.assertEqual(events[-1].kind, REJECTED)
+        self.assertEqual(events[-1].field, 'passport_number')
+        self.assertEqual(ignored, [])
+        self.assertNotIn('birth_date', self.decoder.decoded_mrz)
+        self.assertFalse(self.decoder.complete)
+
+    """
+    test structural problems are rejected at the offending character
+    """
+    def test_malformed_input_rejects_at_offending_character(self):
+        # act / assert
+        self.assertEqual(self.decoder.feed('P<CIVLYNN<<NEVEAH\n')[-1],
+                         MRZEvent(REJECTED, 'names', 'line 1 ended after 17 of 44 characters'))
+        self.decoder.reset()
+        self.assertEqual(self.decoder.feed(self.encoded_mrzs[0][:58] + 'X')[-1],
+                         MRZEvent(REJECTED, 'birth_date', "unexpected character 'X' at position 58 (birth_date)"))
+
+    """
+    test a '<' filler for an unspecified sex is accepted and decoded like the full record
+    """
+    def test_unspecified_sex_is_accepted(self):
+        # assemble
+        encoded_mrz = self.encoded_mrzs[0][:65] + '<' + self.encoded_mrzs[0][66:]
+        # act
+        events = self.decoder.feed(encoded_mrz)
+        # assert
+        self.assertIn(MRZEvent(FIELD, 'sex', '<'), events)
+        self.assertEqual(events[-1], MRZEvent(COMPLETE, None, MachineReadableTravelDocument().decode(encoded_mrz)))
+
+    """
+    test an empty personal number with '<' standing in for its check digit completes the scan
+    """
+    def test_filler_personal_number_check_digit_is_accepted(self):
+        # assemble
+        encoded_mrz = self.encoded_mrzs[0][:73] + '<' * 16
+        # act
+        events = self.decoder.feed(encoded_mrz)
+        # assert
+        self.assertIn(MRZEvent(FIELD, 'personal_number', ''), events)
+        self.assertEqual(events[-1], MRZEvent(COMPLETE, None, MachineReadableTravelDocument().decode(encoded_mrz)))
+
+if __name__ == '__main__':
+    print('Running unit tests for IncrementalMRZDecoder')
+    unittest.main(exit=False, verbosity=2)
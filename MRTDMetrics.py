@@ -0,0 +1,88 @@
+import os
+import threading
+
+METRIC_NAME = "mrtd_stage_duration_seconds"
+
+class StageTiming:
+    """
+    running count, total, min and max of one stage's durations in nanoseconds
+    """
+    __slots__ = ("count", "total_ns", "min_ns", "max_ns")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total_ns": self.total_ns,
+            "min_ns": self.min_ns,
+            "max_ns": self.max_ns,
+            "mean_ns": self.total_ns / self.count if self.count else 0.0
+        }
+
+class MetricsAggregator:
+    """
+    in-memory instrumentation sink for MachineReadableTravelDocument; pass it as
+    instrumentation= and it accumulates a StageTiming per stage name:
+    decode_mrz_input: "split", "line1_names", "line2_slice", "check_digit:<field identifier>"
+    decode/decode_many/decode_stream, per record: "parse", "check_digits"
+    decode_many, per batch: "decode_projection" (fields=), "layout_decode_many" (layout=)
+    encode_mrz_input/encode: "encode_validation", "encode_check_digits", "encode_assembly"
+    encode_many, per batch: "encode_many_validation", "encode_many_check_digits",
+    "encode_many_assembly", or "layout_encode_many" (layout=)
+    """
+    def __init__(self):
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    """
+    Method called by the instrumented pipeline once per stage execution
+    """
+    def observe(self, stage: str, elapsed_ns: int) -> None:
+        with self._lock:
+            timing = self._stages.get(stage)
+            if timing is None:
+                timing = self._stages[stage] = StageTiming()
+            timing.count += 1
+            timing.total_ns += elapsed_ns
+            if timing.min_ns is None or elapsed_ns < timing.min_ns:
+                timing.min_ns = elapsed_ns
+            if elapsed_ns > timing.max_ns:
+                timing.max_ns = elapsed_ns
+
+    def stages(self) -> dict:
+        with self._lock:
+            return {stage: timing.as_dict() for stage, timing in self._stages.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+
+    """
+    Method to render the stage timings in the Prometheus text exposition format, as a
+    summary with _sum and _count series labelled by stage
+    """
+    def to_prometheus(self) -> str:
+        lines = [
+            "# HELP {} Time spent in each MRTD pipeline stage.".format(METRIC_NAME),
+            "# TYPE {} summary".format(METRIC_NAME)
+        ]
+        for stage, timing in sorted(self.stages().items()):
+            label = '{{stage="{}"}}'.format(stage.replace("\\", "\\\\").replace('"', '\\"'))
+            lines.append("{}_sum{} {:.9f}".format(METRIC_NAME, label, timing["total_ns"] / 1e9))
+            lines.append("{}_count{} {}".format(METRIC_NAME, label, timing["count"]))
+        return "\n".join(lines) + "\n"
+
+    """
+    Method to write to_prometheus() to a file (e.g. for the node_exporter textfile
+    collector), replacing it atomically so scrapers never read a partial file
+    """
+    def dump_prometheus(self, path: str) -> None:
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "w") as file:
+            file.write(self.to_prometheus())
+        os.replace(temporary_path, path)
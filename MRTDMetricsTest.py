@@ -0,0 +1,98 @@
+import unittest
+import json
+import os
+import tempfile
+from MRTD import MachineReadableTravelDocument
+from MRTDMetrics import MetricsAggregator
+
+class TestMetricsAggregator(unittest.TestCase):
+    """
+    setUp method for the test class; loads a few sample records
+    """
+    def setUp(self) -> None:
+        with open('resources/records_encoded.json', 'r') as file:
+            self.encoded_mrzs = json.load(file).get('records_encoded')[:20]
+        return super().setUp()
+
+    """
+    test an instrumented decode/encode reports every hot-path stage and the same output
+    """
+    def test_instrumented_pipeline_reports_stages(self):
+        # assemble
+        metrics = MetricsAggregator()
+        instrumented = MachineReadableTravelDocument(instrumentation=metrics)
+        plain = MachineReadableTravelDocument()
+        decoded = {"line1": {"issuing_country": "UTO", "last_name": "ERIKSSON", "given_name": "ANNA MARIA"},
+                   "line2": {"passport_number": "L898902C3", "country_code": "UTO", "birth_date": "740812",
+                             "sex": "F", "expiration_date": "120415", "personal_number": "ZE184226B"}}
+        # act
+        for encoded_mrz in self.encoded_mrzs:
+            self.assertEqual(instrumented.decode_mrz_input(encoded_mrz), plain.decode_mrz_input(encoded_mrz))
+        self.assertEqual(instrumented.encode_mrz_input(decoded), plain.encode_mrz_input(decoded))
+        stages = metrics.stages()
+        # assert
+        for stage in ("split", "line1_names", "line2_slice", "check_digit:Passport"):
+            self.assertEqual(stages[stage]["count"], 20)
+        for stage in ("encode_validation", "encode_check_digits", "encode_assembly"):
+            self.assertEqual(stages[stage]["count"], 1)
+        self.assertLessEqual(stages["split"]["min_ns"], stages["split"]["max_ns"])
+
+    """
+    test the batch decode_many/encode_many paths report their parse, check digit and assembly stages
+    """
+    def test_instrumented_batch_paths_report_stages(self):
+        # assemble
+        metrics = MetricsAggregator()
+        instrumented = MachineReadableTravelDocument(instrumentation=metrics)
+        plain = MachineReadableTravelDocument()
+        # act
+        decoded = instrumented.decode_many(self.encoded_mrzs)
+        encoded = instrumented.encode_many(instrumented.decode_many(self.encoded_mrzs, as_record=True))
+        stages = metrics.stages()
+        # assert
+        self.assertEqual(decoded, plain.decode_many(self.encoded_mrzs))
+        self.assertEqual(encoded, self.encoded_mrzs)
+        for stage in ("parse", "check_digits"):
+            self.assertEqual(stages[stage]["count"], 40)
+        for stage in ("encode_many_validation", "encode_many_check_digits", "encode_many_assembly"):
+            self.assertEqual(stages[stage]["count"], 1)
+
+    """
+    test the layout and field projection batches report one stage per batch
+    """
+    def test_instrumented_layout_paths_report_stages(self):
+        # assemble
+        metrics = MetricsAggregator()
+        instrumented = MachineReadableTravelDocument(instrumentation=metrics)
+        # act
+        decoded = instrumented.decode_many(self.encoded_mrzs, as_record=True, layout='TD3')
+        encoded = instrumented.encode_many(decoded, layout='TD3')
+        instrumented.decode_many(self.encoded_mrzs, fields=['passport_number'])
+        stages = metrics.stages()
+        # assert
+        self.assertEqual(encoded, self.encoded_mrzs)
+        self.assertEqual({stage: timing["count"] for stage, timing in stages.items()},
+                         {"layout_decode_many": 1, "layout_encode_many": 1, "decode_projection": 1})
+
+    """
+    test the Prometheus dump contains a _sum and _count series per stage
+    """
+    def test_dump_prometheus_writes_text_format(self):
+        # assemble
+        metrics = MetricsAggregator()
+        metrics.observe("split", 1500)
+        metrics.observe("split", 500)
+        # act
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'mrtd.prom')
+            metrics.dump_prometheus(path)
+            with open(path, 'r') as file:
+                text = file.read()
+        # assert
+        self.assertIn('# TYPE mrtd_stage_duration_seconds summary', text)
+        self.assertIn('mrtd_stage_duration_seconds_sum{stage="split"} 0.000002000', text)
+        self.assertIn('mrtd_stage_duration_seconds_count{stage="split"} 2', text)
+
+if __name__ == '__main__':
+    print('Running unit tests for MetricsAggregator')
+    unittest.main(exit=False, verbosity=2)
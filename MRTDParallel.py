@@ -0,0 +1,138 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from MRTD import MachineReadableTravelDocument
+
+DEFAULT_CHUNK_SIZE = 1000
+
+"""
+worker function to decode one chunk in a pool process; every record gets a fresh result
+dict and a failing record is reported in place instead of aborting the chunk
+"""
+def _decode_chunk(encoded_mrzs: list) -> list:
+    mrtd = MachineReadableTravelDocument()
+    results = []
+    for encoded_mrz in encoded_mrzs:
+        mrtd.decoded_mrz = {}
+        try:
+            results.append((mrtd.decode_mrz_input(encoded_mrz), None))
+        except Exception as ex:
+            results.append((None, "{}: {}".format(type(ex).__name__, ex)))
+    return results
+
+"""
+worker function to encode one chunk in a pool process
+"""
+def _encode_chunk(decoded_mrzs: list) -> list:
+    mrtd = MachineReadableTravelDocument()
+    results = []
+    for decoded_mrz in decoded_mrzs:
+        try:
+            results.append((mrtd.encode_mrz_input(decoded_mrz), None))
+        except Exception as ex:
+            results.append((None, "{}: {}".format(type(ex).__name__, ex)))
+    return results
+
+"""
+worker function to run one stateless codec operation (MachineReadableTravelDocument.decode
+or .encode) over a chunk in a pool thread
+"""
+def _apply_chunk(operation, records: list) -> list:
+    results = []
+    for record in records:
+        try:
+            results.append((operation(record), None))
+        except Exception as ex:
+            results.append((None, "{}: {}".format(type(ex).__name__, ex)))
+    return results
+
+class BatchResult:
+    """
+    results holds one entry per input record in input order (None where the record failed);
+    failures holds (index, message) pairs for the failed records
+    """
+    def __init__(self, results: list, failures: list):
+        self.results = results
+        self.failures = failures
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+class ParallelMRTDExecutor:
+    """
+    Runs decode_mrz_input/encode_mrz_input over a process pool; input is split into
+    chunks of chunk_size records which are fanned out to the given number of workers
+    """
+    def __init__(self, workers: int = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._pool = None
+
+    """
+    the pool is kept alive between batches when the executor is used as a context manager
+    """
+    def __enter__(self):
+        self._pool = self._create_pool()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self._pool.shutdown()
+        self._pool = None
+
+    """
+    Method to decode many MRZ strings in parallel, keeping results in input order
+    """
+    def decode(self, encoded_mrzs) -> BatchResult:
+        return self._run(_decode_chunk, encoded_mrzs)
+
+    """
+    Method to encode many JSON payloads in parallel, keeping results in input order
+    """
+    def encode(self, decoded_mrzs) -> BatchResult:
+        return self._run(_encode_chunk, decoded_mrzs)
+
+    """
+    helper function to fan chunks out to the pool and merge the per-record outcomes
+    """
+    def _run(self, worker, records) -> BatchResult:
+        records = list(records)
+        chunks = [records[start:start + self.chunk_size] for start in range(0, len(records), self.chunk_size)]
+        if self._pool is not None:
+            outcomes = self._pool.map(worker, chunks)
+            return self._merge(outcomes)
+        with self._create_pool() as pool:
+            return self._merge(pool.map(worker, chunks))
+
+    def _create_pool(self):
+        return ProcessPoolExecutor(max_workers=self.workers)
+
+    def _merge(self, outcomes) -> BatchResult:
+        results = []
+        failures = []
+        for chunk_outcome in outcomes:
+            for result, error in chunk_outcome:
+                if error is not None:
+                    failures.append((len(results), error))
+                results.append(result)
+        return BatchResult(results, failures)
+
+class ThreadedMRTDExecutor(ParallelMRTDExecutor):
+    """
+    Runs the stateless decode/encode of one shared MachineReadableTravelDocument over a
+    thread pool; no pickling or process start-up, so it suits small batches, workloads
+    interleaved with I/O and free-threaded interpreters
+    """
+    def __init__(self, workers: int = None, chunk_size: int = DEFAULT_CHUNK_SIZE, mrtd: MachineReadableTravelDocument = None):
+        super().__init__(workers, chunk_size)
+        self.mrtd = mrtd if mrtd is not None else MachineReadableTravelDocument()
+
+    def decode(self, encoded_mrzs) -> BatchResult:
+        return self._run(partial(_apply_chunk, self.mrtd.decode), encoded_mrzs)
+
+    def encode(self, decoded_mrzs) -> BatchResult:
+        return self._run(partial(_apply_chunk, self.mrtd.encode), decoded_mrzs)
+
+    def _create_pool(self):
+        return ThreadPoolExecutor(max_workers=self.workers)
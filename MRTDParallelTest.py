@@ -0,0 +1,128 @@
+import unittest
+import json
+import sys
+import time
+import threading
+from MRTD import MachineReadableTravelDocument
+from MRTDParallel import ParallelMRTDExecutor, ThreadedMRTDExecutor
+
+class TestParallelMRTDExecutor(unittest.TestCase):
+    """
+    setUp method for the test class; loads the three sample records
+    """
+    def setUp(self) -> None:
+        with open('resources/encoded_3.json', 'r') as file:
+            self.encoded_mrzs = json.load(file).get('records_encoded')
+        with open('resources/decoded_3.json', 'r') as file:
+            self.decoded_mrzs = json.load(file).get('records_decoded')
+        return super().setUp()
+
+    """
+    test parallel decode keeps input order and reports the malformed record without failing the batch
+    """
+    def test_decode_keeps_order_and_reports_failures(self):
+        # assemble
+        encoded_mrzs = self.encoded_mrzs + ["P<CIVLYNN<<NEVEAH<BRAM"] + self.encoded_mrzs
+        # act
+        with ParallelMRTDExecutor(workers=2, chunk_size=2) as executor:
+            batch = executor.decode(encoded_mrzs)
+        # assert
+        self.assertEqual(len(batch), 7)
+        self.assertEqual([index for index, _ in batch.failures], [3])
+        self.assertIsNone(batch.results[3])
+        expected = [MachineReadableTravelDocument().decode_mrz_input(encoded_mrz) for encoded_mrz in self.encoded_mrzs]
+        self.assertEqual(batch.results[:3], expected)
+        self.assertEqual(batch.results[4:], expected)
+
+    """
+    test parallel encode returns the encoded strings in order and reports the record missing a field
+    """
+    def test_encode_keeps_order_and_reports_failures(self):
+        # assemble
+        del self.decoded_mrzs[1]['line2']['sex']
+        # act
+        batch = ParallelMRTDExecutor(workers=2, chunk_size=1).encode(self.decoded_mrzs)
+        # assert
+        self.assertEqual(batch.results, [self.encoded_mrzs[0], None, self.encoded_mrzs[2]])
+        self.assertEqual(len(batch.failures), 1)
+        self.assertEqual(batch.failures[0][0], 1)
+        self.assertIn("'sex'", batch.failures[0][1])
+
+    """
+    test executor rejects a chunk size below one
+    """
+    def test_executor_raises_value_error_when_chunk_size_invalid(self):
+        with self.assertRaises(ValueError):
+            ParallelMRTDExecutor(chunk_size=0)
+
+class TestThreadedMRTDExecutor(unittest.TestCase):
+    """
+    setUp method for the test class; loads the sample records and forces frequent thread switches
+    """
+    def setUp(self) -> None:
+        with open('resources/records_encoded.json', 'r') as file:
+            self.encoded_mrzs = json.load(file).get('records_encoded')[:2000]
+        self.switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        sys.setswitchinterval(self.switch_interval)
+        return super().tearDown()
+
+    """
+    stress test one shared instance from many threads; every result matches a serial decode
+    and encode and no two results are the same object
+    """
+    def test_shared_instance_is_reentrant_under_threads(self):
+        # assemble
+        mrtd = MachineReadableTravelDocument()
+        expected = [MachineReadableTravelDocument().decode(encoded_mrz) for encoded_mrz in self.encoded_mrzs]
+        mismatches = []
+        def worker(offset):
+            for index in range(offset, len(self.encoded_mrzs), 8):
+                decoded_mrz = mrtd.decode(self.encoded_mrzs[index])
+                if decoded_mrz != expected[index]:
+                    mismatches.append(index)
+        threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(8)]
+        # act
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with ThreadedMRTDExecutor(workers=8, chunk_size=25, mrtd=mrtd) as executor:
+            decoded = executor.decode(self.encoded_mrzs)
+            records = [mrtd.decode(encoded_mrz, as_record=True) for encoded_mrz in self.encoded_mrzs[:100]]
+            encoded = executor.encode(records)
+        # assert
+        self.assertEqual(mismatches, [])
+        self.assertEqual(decoded.results, expected)
+        self.assertEqual(len({id(result) for result in decoded.results}), len(expected))
+        self.assertEqual(encoded.results, mrtd.encode_many(records))
+        self.assertEqual(mrtd.decoded_mrz, {})
+        self.assertEqual(mrtd.encoded_mrz, "")
+
+    """
+    test throughput scales with threads when decoding is interleaved with I/O
+    """
+    def test_throughput_scales_with_io_interleaved_workload(self):
+        # assemble
+        class IOBoundMRTD(MachineReadableTravelDocument):
+            def decode(self, encoded_mrz, as_record=False):
+                decoded_mrz = super().decode(encoded_mrz, as_record)
+                time.sleep(0.001)
+                return decoded_mrz
+        mrtd = IOBoundMRTD()
+        elapsed = {}
+        # act
+        for workers in (1, 8):
+            started = time.perf_counter()
+            batch = ThreadedMRTDExecutor(workers=workers, chunk_size=10, mrtd=mrtd).decode(self.encoded_mrzs[:200])
+            elapsed[workers] = time.perf_counter() - started
+            self.assertEqual(batch.failures, [])
+        # assert
+        self.assertLess(elapsed[8], elapsed[1] / 3)
+
+if __name__ == '__main__':
+    print('Running unit tests for ParallelMRTDExecutor')
+    unittest.main(exit=False, verbosity=2)
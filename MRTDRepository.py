@@ -0,0 +1,183 @@
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from MRTD import LINE_1_FIELDS, LINE_2_FIELDS
+
+DEFAULT_POOL_SIZE = 4
+# variable limit of SQLite builds before 3.32, used when the connection cannot report its own
+DEFAULT_VARIABLE_LIMIT = 999
+KEY_VARIABLES = 3
+DEFAULT_PREFETCH_SIZE = 10000
+
+# marks a key not yet looked up, since None is cached for holders that do not exist
+_MISSING = object()
+
+HOLDER_COLUMNS = LINE_1_FIELDS + LINE_2_FIELDS
+# a missing personal number is stored as '' since NULLs in the primary key never compare equal,
+# which would let INSERT OR REPLACE add duplicates and make lookups miss
+CREATE_HOLDERS_TABLE = """
+CREATE TABLE IF NOT EXISTS holders (
+    issuing_country TEXT NOT NULL,
+    last_name TEXT NOT NULL,
+    given_name TEXT NOT NULL,
+    passport_number TEXT NOT NULL,
+    country_code TEXT NOT NULL,
+    birth_date TEXT NOT NULL,
+    sex TEXT NOT NULL,
+    expiration_date TEXT NOT NULL,
+    personal_number TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (last_name, given_name, personal_number)
+)
+"""
+
+class ConnectionPool:
+    """
+    fixed-size pool of sqlite3 connections to one database; connections are created
+    lazily and handed out one caller at a time
+    """
+    def __init__(self, database: str, size: int = DEFAULT_POOL_SIZE, **connect_kwargs):
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        self.database = database
+        self.size = size
+        self.connect_kwargs = dict(connect_kwargs, check_same_thread=False)
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._created = 0
+        self._lock = threading.Lock()
+
+    """
+    Method to borrow a connection for the duration of a with block
+    """
+    @contextmanager
+    def connection(self):
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                self._created += create
+            if create:
+                connection = sqlite3.connect(self.database, **self.connect_kwargs)
+            else:
+                connection = self._idle.get()
+        try:
+            yield connection
+        finally:
+            self._idle.put(connection)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+class HolderRepository:
+    """
+    batched data access for passport holder fields; lookups by (last_name, given_name,
+    personal_number) are grouped into one query per batch_size holders and returned in
+    the {"line1": ..., "line2": ...} shape expected by encode_mrz_input; a holder without
+    personal number is keyed and returned with personal_number None
+    @param batch_size: holders per query, by default as many as the SQLite variable limit allows
+    @param prefetch_size: holders (and misses) kept for get_fields_for_user, least recently used dropped first
+    """
+    def __init__(self, pool: ConnectionPool, batch_size: int = None, prefetch_size: int = DEFAULT_PREFETCH_SIZE):
+        self.pool = pool
+        self.prefetch_size = prefetch_size
+        self.round_trips = 0
+        self._prefetched = OrderedDict()
+        with self.pool.connection() as connection:
+            with connection:
+                connection.execute(CREATE_HOLDERS_TABLE)
+            if batch_size is None:
+                getlimit = getattr(connection, 'getlimit', None)
+                variable_limit = getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER) if getlimit is not None else DEFAULT_VARIABLE_LIMIT
+                batch_size = variable_limit // KEY_VARIABLES
+        self.batch_size = batch_size
+
+    """
+    Method to insert or replace many holders from encode_mrz_input payloads in one transaction;
+    the transaction is rolled back when any row fails, and prefetched copies of the holders are dropped
+    """
+    def insert_many(self, decoded_mrzs) -> None:
+        rows = [
+            tuple(decoded_mrz['line1'][field] for field in LINE_1_FIELDS) +
+            tuple(decoded_mrz['line2'].get(field) for field in LINE_2_FIELDS[:-1]) +
+            (decoded_mrz['line2'].get('personal_number') or '',)
+            for decoded_mrz in decoded_mrzs
+        ]
+        with self.pool.connection() as connection:
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO holders ({}) VALUES ({})".format(', '.join(HOLDER_COLUMNS), ', '.join('?' * len(HOLDER_COLUMNS))),
+                    rows
+                )
+        self.round_trips += 1
+        for row in rows:
+            self._prefetched.pop((row[1], row[2], row[8] or None), None)
+
+    """
+    Method to look up many holders with one query per batch
+    @param keys: iterable of (last_name, given_name, personal_number)
+    @return dict mapping each key found to its encode_mrz_input payload
+    """
+    def fetch_many(self, keys) -> dict:
+        keys = list(dict.fromkeys((last_name, given_name, personal_number or None) for last_name, given_name, personal_number in keys))
+        found = {}
+        with self.pool.connection() as connection:
+            for start in range(0, len(keys), self.batch_size):
+                batch = keys[start:start + self.batch_size]
+                query = "SELECT {} FROM holders WHERE (last_name, given_name, personal_number) IN (VALUES {})".format(
+                    ', '.join(HOLDER_COLUMNS), ', '.join(['(?, ?, ?)'] * len(batch)))
+                rows = connection.execute(query, [value or '' for key in batch for value in key]).fetchall()
+                self.round_trips += 1
+                for row in rows:
+                    found[(row[1], row[2], row[8] or None)] = self._to_payload(row)
+        return found
+
+    """
+    Method to prefetch many holders so later get_fields_for_user calls need no query; keys
+    without a holder are remembered as misses
+    """
+    def prefetch(self, keys) -> None:
+        keys = [(last_name, given_name, personal_number or None) for last_name, given_name, personal_number in keys]
+        self._remember(keys, self.fetch_many(keys))
+
+    """
+    Method with the signature of MachineReadableTravelDocument.get_fields_for_user; serves
+    prefetched holders and misses from memory and falls back to a single-holder query
+    """
+    def get_fields_for_user(self, last_name: str, given_name: str, personal_number: str) -> dict:
+        key = (last_name, given_name, personal_number or None)
+        payload = self._prefetched.get(key, _MISSING)
+        if payload is _MISSING:
+            self._remember([key], self.fetch_many([key]))
+            return self._prefetched.get(key)
+        self._prefetched.move_to_end(key)
+        return payload
+
+    """
+    helper function to keep the looked up keys, None for a miss, dropping the least recently
+    used ones over prefetch_size
+    """
+    def _remember(self, keys: list, found: dict) -> None:
+        prefetched = self._prefetched
+        for key in keys:
+            prefetched[key] = found.get(key)
+            prefetched.move_to_end(key)
+        while len(prefetched) > self.prefetch_size:
+            prefetched.popitem(last=False)
+
+    """
+    helper function to convert a holders row into the encode_mrz_input payload, mapping a
+    stored '' personal number back to None
+    """
+    def _to_payload(self, row: tuple) -> dict:
+        line_2 = dict(zip(LINE_2_FIELDS, row[len(LINE_1_FIELDS):]))
+        line_2["personal_number"] = line_2["personal_number"] or None
+        return {
+            "line1": dict(zip(LINE_1_FIELDS, row[:len(LINE_1_FIELDS)])),
+            "line2": line_2
+        }
@@ -0,0 +1,132 @@
+import unittest
+import json
+import os
+import sqlite3
+import tempfile
+from MRTD import MachineReadableTravelDocument
+from MRTDRepository import ConnectionPool, HolderRepository
+
+class TestHolderRepository(unittest.TestCase):
+    """
+    setUp method for the test class; creates a temporary holders database with the sample records
+    """
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.pool = ConnectionPool(os.path.join(self.directory.name, 'holders.db'), size=2)
+        self.repository = HolderRepository(self.pool)
+        with open('resources/decoded_3.json', 'r') as file:
+            self.decoded_mrzs = json.load(file).get('records_decoded')
+        self.repository.insert_many(self.decoded_mrzs)
+        self.repository.round_trips = 0
+        return super().setUp()
+
+    """
+    tearDown method to close the pooled connections and remove the database
+    """
+    def tearDown(self) -> None:
+        self.pool.close()
+        self.directory.cleanup()
+        return super().tearDown()
+
+    """
+    test fetch_many sizes its batches from the SQLite variable limit and returns payloads encode_many can consume
+    """
+    def test_fetch_many_returns_payloads_in_few_round_trips(self):
+        # assemble
+        holders = [
+            {"line1": {"issuing_country": "UTO", "last_name": "HOLDER", "given_name": "NUMBER {}".format(index)},
+             "line2": {"passport_number": "X{:08d}".format(index), "country_code": "UTO", "birth_date": "800101",
+                       "sex": "F", "expiration_date": "300101", "personal_number": "P{:08d}".format(index)}}
+            for index in range(1000)
+        ]
+        self.repository.insert_many(holders)
+        keys = [(holder['line1']['last_name'], holder['line1']['given_name'], holder['line2']['personal_number']) for holder in holders]
+        self.repository.round_trips = 0
+        small_batches = HolderRepository(self.pool, batch_size=300)
+        # act
+        found = self.repository.fetch_many(keys + [('NOBODY', 'AT ALL', 'Z00000000')])
+        # assert
+        with self.pool.connection() as connection:
+            self.assertEqual(self.repository.batch_size, connection.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER) // 3)
+        self.assertEqual(self.repository.round_trips, 1)
+        self.assertEqual(small_batches.fetch_many(keys + [('NOBODY', 'AT ALL', 'Z00000000')]), found)
+        self.assertEqual(small_batches.round_trips, 4)
+        self.assertEqual(len(found), 1000)
+        self.assertEqual(found[keys[123]], holders[123])
+        mrtd = MachineReadableTravelDocument()
+        self.assertEqual(mrtd.encode_many(found[key] for key in keys[:5]), mrtd.encode_many(holders[:5]))
+
+    """
+    test get_fields_for_user serves prefetched holders without another query
+    """
+    def test_get_fields_for_user_uses_prefetched_holders(self):
+        # assemble
+        self.repository.prefetch([('LYNN', 'NEVEAH BRAM', 'AJ010215I'), ('VEGA', 'ELSIE TAVIAN', 'FT004677S')])
+        # act
+        fields = self.repository.get_fields_for_user('VEGA', 'ELSIE TAVIAN', 'FT004677S')
+        missing = self.repository.get_fields_for_user('LYNN', 'NEVEAH', 'AJ010215I')
+        # assert
+        self.assertEqual(fields, self.decoded_mrzs[2])
+        self.assertIsNone(missing)
+        self.assertEqual(self.repository.round_trips, 2)
+
+    """
+    test prefetched holders are bounded, remember misses and are dropped when the holder is replaced
+    """
+    def test_prefetched_holders_are_bounded_and_invalidated(self):
+        # assemble
+        repository = HolderRepository(self.pool, prefetch_size=2)
+        keys = [(decoded['line1']['last_name'], decoded['line1']['given_name'], decoded['line2']['personal_number'])
+                for decoded in self.decoded_mrzs]
+        missing = ('NOBODY', 'AT ALL', 'Z00000000')
+        renewed = {"line1": self.decoded_mrzs[2]["line1"], "line2": dict(self.decoded_mrzs[2]["line2"], expiration_date="350101")}
+        # act
+        repository.prefetch(keys + [missing])
+        repository.round_trips = 0
+        misses = [repository.get_fields_for_user(*missing) for _ in range(3)]
+        repository.insert_many([renewed])
+        fields = repository.get_fields_for_user(*keys[2])
+        # assert
+        self.assertEqual(misses, [None] * 3)
+        self.assertEqual(fields, renewed)
+        self.assertEqual(repository.round_trips, 2)
+        self.assertEqual(len(repository._prefetched), 2)
+
+    """
+    test a failing insert rolls back the whole batch and leaves no open transaction on the pooled connection
+    """
+    def test_failed_insert_rolls_back(self):
+        # assemble
+        holder = {"line1": dict(self.decoded_mrzs[0]["line1"], last_name="NEWCOMER"), "line2": self.decoded_mrzs[0]["line2"]}
+        broken = {"line1": self.decoded_mrzs[1]["line1"], "line2": dict(self.decoded_mrzs[1]["line2"], sex=None)}
+        # act
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.repository.insert_many([holder, broken])
+        # assert
+        with self.pool.connection() as connection:
+            self.assertFalse(connection.in_transaction)
+        self.assertEqual(self.repository.fetch_many([("NEWCOMER", holder["line1"]["given_name"], holder["line2"]["personal_number"])]), {})
+
+    """
+    test holders without personal number are replaced rather than duplicated and can be looked up
+    """
+    def test_holder_without_personal_number_round_trips(self):
+        # assemble
+        holder = {"line1": dict(self.decoded_mrzs[0]["line1"]), "line2": dict(self.decoded_mrzs[0]["line2"], personal_number=None)}
+        renewed = {"line1": holder["line1"], "line2": dict(holder["line2"], expiration_date="350101")}
+        key = (holder["line1"]["last_name"], holder["line1"]["given_name"], None)
+        # act
+        self.repository.insert_many([holder])
+        self.repository.insert_many([renewed])
+        found = self.repository.fetch_many([key])
+        fields = self.repository.get_fields_for_user(*key)
+        # assert
+        self.assertEqual(found, {key: renewed})
+        self.assertEqual(fields, renewed)
+        with self.pool.connection() as connection:
+            self.assertEqual(connection.execute("SELECT COUNT(*) FROM holders WHERE personal_number = ''").fetchone(), (1,))
+        self.assertEqual(MachineReadableTravelDocument().encode_mrz_input(fields)[-16:], '<' * 16)
+
+if __name__ == '__main__':
+    print('Running unit tests for HolderRepository')
+    unittest.main(exit=False, verbosity=2)
@@ -0,0 +1,185 @@
+import asyncio
+import time
+from collections import deque
+from MRTD import MachineReadableTravelDocument
+
+DEFAULT_QUEUE_SIZE = 1024
+DEFAULT_LATENCY_WINDOW = 10000
+
+class FakeScanner:
+    """
+    in-process scanner replaying MRZ reads, optionally pausing between reads; like
+    scan_mrz it returns an empty string once there is nothing left to read
+    """
+    def __init__(self, encoded_mrzs, interval: float = 0.0):
+        self._encoded_mrzs = iter(encoded_mrzs)
+        self.interval = interval
+
+    async def read(self) -> str:
+        if self.interval:
+            await asyncio.sleep(self.interval)
+        return next(self._encoded_mrzs, "")
+
+class BlockingScanner:
+    """
+    adapter for a hardware device read through the blocking MachineReadableTravelDocument.scan_mrz;
+    reads run on an executor shared by all devices instead of one thread per device
+    """
+    def __init__(self, device, executor=None):
+        self.device = device
+        self.executor = executor
+
+    async def read(self) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, MachineReadableTravelDocument.scan_mrz, self.device)
+
+class StreamScanner:
+    """
+    scanner reading one MRZ per line from an asyncio stream, e.g. a socket connection
+    """
+    def __init__(self, reader: asyncio.StreamReader):
+        self.reader = reader
+
+    async def read(self) -> str:
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                return ""
+            encoded_mrz = line.decode('ascii', 'replace').strip()
+            if encoded_mrz:
+                return encoded_mrz
+
+class ScannerStats:
+    """
+    per-scanner counters and a bounded window of recent decode latencies in seconds
+    """
+    def __init__(self, latency_window: int):
+        self.scans = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=latency_window)
+
+    """
+    nearest-rank latency percentiles over the window, in milliseconds
+    """
+    def percentiles(self, percents=(50, 95, 99)) -> dict:
+        ordered = sorted(self.latencies)
+        if not ordered:
+            return {"p{}".format(percent): None for percent in percents}
+        return {
+            "p{}".format(percent): ordered[min(len(ordered) - 1, max(0, -(-percent * len(ordered) // 100) - 1))] * 1000
+            for percent in percents
+        }
+
+    def as_dict(self) -> dict:
+        return {"scans": self.scans, "errors": self.errors, **self.percentiles()}
+
+class ScannerIngestionService:
+    """
+    asyncio ingestion layer for many concurrent scanners: every scanner feeds a bounded
+    queue (a full queue suspends the scanner, giving backpressure) that decoder tasks drain;
+    on_result(scanner_name, decoded_mrz, error) is called for every scan
+    """
+    def __init__(self, mrtd: MachineReadableTravelDocument = None, queue_size: int = DEFAULT_QUEUE_SIZE,
+                 decoders: int = 1, on_result=None, latency_window: int = DEFAULT_LATENCY_WINDOW):
+        self.mrtd = mrtd if mrtd is not None else MachineReadableTravelDocument()
+        self.queue_size = queue_size
+        self.decoders = decoders
+        self.on_result = on_result
+        self.latency_window = latency_window
+        self.scanners = {}
+        self._queue = None
+        self._consumers = []
+
+    """
+    Method to ingest from the given {name: scanner} sources until every scanner is exhausted
+    @return per-scanner stats
+    """
+    async def run(self, scanners: dict) -> dict:
+        self._start()
+        ingesting = [asyncio.ensure_future(self.ingest(name, scanner)) for name, scanner in scanners.items()]
+        try:
+            await asyncio.gather(*ingesting)
+            await self._queue.join()
+        finally:
+            # the queue is drained on success; on an error or cancellation the other scanners are
+            # cancelled before the queue they feed is dropped along with the pending scans
+            for task in ingesting:
+                task.cancel()
+            await asyncio.gather(*ingesting, return_exceptions=True)
+            await self.stop(drain=False)
+        return self.stats()
+
+    """
+    Method to accept newline-delimited MRZ reads from scanners connecting over a local socket;
+    each connection is tracked as its own scanner
+    """
+    async def serve(self, host: str = '127.0.0.1', port: int = 0) -> asyncio.AbstractServer:
+        self._start()
+
+        async def handle(reader, writer):
+            peer = writer.get_extra_info('peername')
+            name = "{}:{}".format(*peer[:2]) if peer else "socket"
+            try:
+                await self.ingest(name, StreamScanner(reader))
+            finally:
+                writer.close()
+
+        return await asyncio.start_server(handle, host, port)
+
+    """
+    Method to read one scanner until it returns an empty read, queueing each scan
+    """
+    async def ingest(self, name: str, scanner) -> None:
+        self._start()
+        self.scanners.setdefault(name, ScannerStats(self.latency_window))
+        while True:
+            encoded_mrz = await scanner.read()
+            if not encoded_mrz:
+                return
+            await self._queue.put((name, encoded_mrz, time.perf_counter()))
+
+    """
+    Method to wait for the queued scans and stop the decoder tasks
+    @param drain: False to cancel the decoder tasks without waiting for the queued scans
+    """
+    async def stop(self, drain: bool = True) -> None:
+        if self._queue is None:
+            return
+        if drain:
+            await self._queue.join()
+        for consumer in self._consumers:
+            consumer.cancel()
+        await asyncio.gather(*self._consumers, return_exceptions=True)
+        self._consumers = []
+        self._queue = None
+
+    def stats(self) -> dict:
+        return {name: scanner_stats.as_dict() for name, scanner_stats in self.scanners.items()}
+
+    def _start(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._consumers = [asyncio.create_task(self._decode()) for _ in range(self.decoders)]
+
+    """
+    decoder task: every scan is decoded into a fresh dict so concurrent scanners never share results;
+    an exception from on_result is counted as an error of the scan so the task keeps draining the queue
+    """
+    async def _decode(self) -> None:
+        while True:
+            name, encoded_mrz, queued_at = await self._queue.get()
+            try:
+                decoded_mrz, error = self.mrtd.decode_many([encoded_mrz])[0], None
+            except Exception as ex:
+                decoded_mrz, error = None, str(ex)
+            scanner_stats = self.scanners[name]
+            scanner_stats.scans += 1
+            scanner_stats.errors += error is not None
+            scanner_stats.latencies.append(time.perf_counter() - queued_at)
+            try:
+                if self.on_result is not None:
+                    self.on_result(name, decoded_mrz, error)
+            except Exception:
+                scanner_stats.errors += error is None
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,147 @@
+import unittest
+import asyncio
+import json
+from MRTDScanner import FakeScanner, ScannerIngestionService, ScannerStats
+
+class FailingScanner:
+    """
+    scanner returning its reads and then failing like a disconnected device
+    """
+    def __init__(self, encoded_mrzs):
+        self._encoded_mrzs = iter(encoded_mrzs)
+
+    async def read(self) -> str:
+        await asyncio.sleep(0.01)
+        encoded_mrz = next(self._encoded_mrzs, None)
+        if encoded_mrz is None:
+            raise ConnectionError("scanner disconnected")
+        return encoded_mrz
+
+class TestScannerIngestionService(unittest.TestCase):
+    """
+    setUp method for the test class; loads the sample records
+    """
+    def setUp(self) -> None:
+        with open('resources/encoded_3.json', 'r') as file:
+            self.encoded_mrzs = json.load(file).get('records_encoded')
+        self.results = []
+        return super().setUp()
+
+    def on_result(self, name, decoded_mrz, error):
+        self.results.append((name, decoded_mrz, error))
+
+    """
+    test scans from many concurrent scanners are all decoded through a small bounded queue
+    """
+    def test_run_decodes_every_scan_from_concurrent_scanners(self):
+        # assemble
+        service = ScannerIngestionService(queue_size=2, decoders=2, on_result=self.on_result)
+        scanners = {
+            "gate-{}".format(gate): FakeScanner(self.encoded_mrzs * 10 + ["P<CIVLYNN"])
+            for gate in range(5)
+        }
+        # act
+        stats = asyncio.run(service.run(scanners))
+        # assert
+        self.assertEqual(len(self.results), 155)
+        self.assertEqual(sorted(stats), sorted(scanners))
+        self.assertEqual(stats["gate-0"]["scans"], 31)
+        self.assertEqual(stats["gate-0"]["errors"], 1)
+        self.assertIsNotNone(stats["gate-0"]["p99"])
+        decoded = [decoded_mrz for _, decoded_mrz, error in self.results if error is None]
+        self.assertEqual(len({id(decoded_mrz) for decoded_mrz in decoded}), 150)
+
+    """
+    test scans sent over a local socket connection are decoded and tracked per connection
+    """
+    def test_serve_decodes_scans_sent_over_socket(self):
+        # assemble
+        service = ScannerIngestionService(on_result=self.on_result)
+
+        async def scenario():
+            server = await service.serve('127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(('\n'.join(self.encoded_mrzs) + '\n').encode('ascii'))
+            await writer.drain()
+            writer.close()
+            await writer.wait_closed()
+            while len(self.results) < 3:
+                await asyncio.sleep(0.01)
+            server.close()
+            await server.wait_closed()
+            await service.stop()
+
+        # act
+        asyncio.run(asyncio.wait_for(scenario(), timeout=10))
+        # assert
+        self.assertEqual([decoded_mrz['last_name'] for _, decoded_mrz, _ in self.results], ['LYNN', 'MCFARLAND', 'VEGA'])
+        self.assertEqual(sum(scanner['scans'] for scanner in service.stats().values()), 3)
+
+    """
+    test a raising on_result callback is counted as an error and does not stall the decoder tasks
+    """
+    def test_run_counts_callback_errors(self):
+        # assemble
+        def on_result(name, decoded_mrz, error):
+            raise ValueError("downstream failure")
+        service = ScannerIngestionService(queue_size=2, on_result=on_result)
+        # act
+        stats = asyncio.run(asyncio.wait_for(service.run({"gate": FakeScanner(self.encoded_mrzs * 5)}), timeout=10))
+        # assert
+        self.assertEqual((stats["gate"]["scans"], stats["gate"]["errors"]), (15, 15))
+
+    """
+    test a scanner failing while another is still reading stops the run with its error and
+    cancels the healthy scanner before the queue is dropped
+    """
+    def test_failing_scanner_cancels_sibling_scanners(self):
+        # assemble
+        service = ScannerIngestionService(queue_size=2, on_result=self.on_result)
+        healthy = FakeScanner(self.encoded_mrzs * 1000, interval=0.001)
+
+        async def scenario():
+            with self.assertRaises(ConnectionError):
+                await service.run({"gate-0": healthy, "gate-1": FailingScanner(self.encoded_mrzs)})
+            return asyncio.all_tasks() - {asyncio.current_task()}
+
+        # act
+        pending = asyncio.run(scenario())
+        # assert
+        self.assertEqual(pending, set())
+        self.assertIsNone(service._queue)
+        self.assertLess(service.stats()["gate-0"]["scans"], 3000)
+
+    """
+    test cancelling a run cancels its scanners and stops without draining the queued scans
+    """
+    def test_cancelled_run_stops_without_draining_queue(self):
+        # assemble
+        service = ScannerIngestionService(queue_size=2, on_result=self.on_result)
+
+        async def scenario():
+            run = asyncio.ensure_future(service.run({"gate": FakeScanner(self.encoded_mrzs * 1000, interval=0.001)}))
+            await asyncio.sleep(0.05)
+            run.cancel()
+            done, _ = await asyncio.wait({run}, timeout=1)
+            return done, asyncio.all_tasks() - {asyncio.current_task()}
+
+        # act
+        done, pending = asyncio.run(scenario())
+        # assert
+        self.assertEqual(len(done), 1)
+        self.assertTrue(done.pop().cancelled())
+        self.assertEqual(pending, set())
+        self.assertIsNone(service._queue)
+
+    """
+    test nearest-rank percentiles are reported in milliseconds
+    """
+    def test_scanner_stats_percentiles(self):
+        stats = ScannerStats(latency_window=100)
+        stats.latencies.extend(index / 1000 for index in range(1, 101))
+        self.assertEqual(stats.percentiles(), {"p50": 50.0, "p95": 95.0, "p99": 99.0})
+
+if __name__ == '__main__':
+    print('Running unit tests for ScannerIngestionService')
+    unittest.main(exit=False, verbosity=2)
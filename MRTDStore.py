@@ -0,0 +1,97 @@
+from bisect import bisect_left
+from MRTD import MRZRecord
+
+"""
+helper function to read a field from a decoded dict or an MRZRecord
+"""
+def _field(record, field: str):
+    if isinstance(record, MRZRecord):
+        return getattr(record, field)
+    return record.get(field)
+
+class MRZStore:
+    """
+    in-memory store of decoded records (dicts or MRZRecords) with hash indexes on
+    passport_number, personal_number and (last_name, given_name), and a sorted index on
+    expiration_date; records missing a field (e.g. after a failed check digit) are kept
+    but left out of that field's index. Dates compare as YYMMDD strings.
+    """
+    def __init__(self, records=()):
+        self._records = []
+        self._by_passport_number = {}
+        self._by_personal_number = {}
+        self._by_name = {}
+        self._by_expiration_date = []  # sorted (expiration_date, record id) pairs
+        self.add_many(records)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self):
+        return iter(self._records)
+
+    """
+    Method to insert one newly decoded record into every index
+    """
+    def add(self, record) -> None:
+        expiration_date = self._index(record)
+        if expiration_date is not None:
+            position = bisect_left(self._by_expiration_date, (expiration_date, len(self._records) - 1))
+            self._by_expiration_date.insert(position, (expiration_date, len(self._records) - 1))
+
+    """
+    Method to insert many records, re-sorting the expiration index once for the whole batch
+    """
+    def add_many(self, records) -> None:
+        added = []
+        for record in records:
+            expiration_date = self._index(record)
+            if expiration_date is not None:
+                added.append((expiration_date, len(self._records) - 1))
+        if added:
+            self._by_expiration_date.extend(added)
+            self._by_expiration_date.sort()
+
+    """
+    exact lookups return a fresh list, so callers cannot change the index through the result
+    """
+    def by_passport_number(self, passport_number: str) -> list:
+        return list(self._by_passport_number.get(passport_number, ()))
+
+    def by_personal_number(self, personal_number: str) -> list:
+        return list(self._by_personal_number.get(personal_number, ()))
+
+    def by_name(self, last_name: str, given_name: str) -> list:
+        return list(self._by_name.get((last_name, given_name), ()))
+
+    """
+    Method to find the records expiring strictly before the given YYMMDD date
+    """
+    def expiring_before(self, expiration_date: str) -> list:
+        end = bisect_left(self._by_expiration_date, (expiration_date,))
+        return [self._records[record_id] for _, record_id in self._by_expiration_date[:end]]
+
+    """
+    Method to find the records expiring in [start, end), both YYMMDD dates
+    """
+    def expiring_between(self, start: str, end: str) -> list:
+        first = bisect_left(self._by_expiration_date, (start,))
+        last = bisect_left(self._by_expiration_date, (end,))
+        return [self._records[record_id] for _, record_id in self._by_expiration_date[first:last]]
+
+    """
+    helper function to store a record and add it to the hash indexes
+    @return the record's expiration date for the sorted index, or None
+    """
+    def _index(self, record):
+        self._records.append(record)
+        passport_number = _field(record, 'passport_number')
+        if passport_number is not None:
+            self._by_passport_number.setdefault(passport_number, []).append(record)
+        personal_number = _field(record, 'personal_number')
+        if personal_number is not None:
+            self._by_personal_number.setdefault(personal_number, []).append(record)
+        last_name = _field(record, 'last_name')
+        if last_name is not None:
+            self._by_name.setdefault((last_name, _field(record, 'given_name')), []).append(record)
+        return _field(record, 'expiration_date')
@@ -0,0 +1,78 @@
+import unittest
+import json
+from MRTD import MachineReadableTravelDocument
+from MRTDStore import MRZStore
+
+class TestMRZStore(unittest.TestCase):
+    """
+    setUp method for the test class; indexes the first 500 sample records
+    """
+    def setUp(self) -> None:
+        with open('resources/records_encoded.json', 'r') as file:
+            encoded_mrzs = json.load(file).get('records_encoded')[:500]
+        self.records = MachineReadableTravelDocument().decode_many(encoded_mrzs)
+        self.store = MRZStore(self.records)
+        return super().setUp()
+
+    """
+    test exact lookups match a linear search over the records
+    """
+    def test_exact_lookups_match_linear_search(self):
+        # assemble
+        record = self.records[42]
+        # act / assert
+        self.assertEqual(len(self.store), 500)
+        self.assertEqual(self.store.by_passport_number(record['passport_number']),
+                         [r for r in self.records if r['passport_number'] == record['passport_number']])
+        self.assertEqual(self.store.by_personal_number(record['personal_number']),
+                         [r for r in self.records if r['personal_number'] == record['personal_number']])
+        self.assertEqual(self.store.by_name(record['last_name'], record['given_name']),
+                         [r for r in self.records if (r['last_name'], r['given_name']) == (record['last_name'], record['given_name'])])
+        self.assertEqual(self.store.by_passport_number('NOPE'), [])
+
+    """
+    test range queries on expiration_date return the same records as filtering
+    """
+    def test_expiration_range_queries_match_filter(self):
+        before = self.store.expiring_before('500101')
+        between = self.store.expiring_between('100101', '200101')
+        self.assertCountEqual(before, [r for r in self.records if r['expiration_date'] < '500101'])
+        self.assertCountEqual(between, [r for r in self.records if '100101' <= r['expiration_date'] < '200101'])
+        self.assertEqual([r['expiration_date'] for r in before], sorted(r['expiration_date'] for r in before))
+
+    """
+    test incremental insert updates every index, and records without line 2 fields are kept unindexed
+    """
+    def test_add_indexes_new_scan(self):
+        # assemble
+        scan = dict(self.records[0], passport_number='ZZ0000000', expiration_date='000102')
+        partial = {'document_type': 'P', 'issuing_country': 'CIV', 'last_name': 'LYNN', 'given_name': 'NEVEAH'}
+        # act
+        self.store.add(scan)
+        self.store.add(partial)
+        # assert
+        self.assertEqual(len(self.store), 502)
+        self.assertEqual(self.store.by_passport_number('ZZ0000000'), [scan])
+        self.assertIn(scan, self.store.expiring_between('000102', '000103'))
+        self.assertIn(partial, self.store.by_name('LYNN', 'NEVEAH'))
+
+    """
+    test changing a lookup result leaves the store's indexes untouched
+    """
+    def test_lookups_return_copies(self):
+        # assemble
+        record = self.records[42]
+        # act
+        for lookup in (self.store.by_passport_number(record['passport_number']), self.store.by_personal_number(record['personal_number']),
+                       self.store.by_name(record['last_name'], record['given_name']), self.store.by_passport_number('NOPE')):
+            lookup.clear()
+            lookup.append(None)
+        # assert
+        self.assertEqual(self.store.by_passport_number(record['passport_number']), [record])
+        self.assertEqual(self.store.by_personal_number(record['personal_number']), [record])
+        self.assertIn(record, self.store.by_name(record['last_name'], record['given_name']))
+        self.assertEqual(self.store.by_passport_number('NOPE'), [])
+
+if __name__ == '__main__':
+    print('Running unit tests for MRZStore')
+    unittest.main(exit=False, verbosity=2)
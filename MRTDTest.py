@@ -1,6 +1,15 @@
+import io
+import contextlib
+import os
+import tempfile
 import unittest
 import json
-from MRTD import MachineReadableTravelDocument
+from MRTD import MachineReadableTravelDocument, compute_check_digit, generate_check_digits, iter_mrz_records
+from MRTD import MRZRecord, decode_columnar, pack_mrz_records
+from MRTD import MRZArchive, MRZArchiveWriter, convert_json_to_archive
+from MRTD import partition_mrz_inputs, prevalidate_mrz
+from MRTD import TD1_LAYOUT, TD2_LAYOUT, TD3_LAYOUT, LazyMRZRecord
+from MRTD import BIRTH_DATE_INVALID, MALFORMED_INPUT, PERSONAL_NUMBER_INVALID
 from unittest.mock import patch
 
 class TestMachineReadableTravelDocument(unittest.TestCase):
@@ -271,6 +280,507 @@ class TestMachineReadableTravelDocument(unittest.TestCase):
         # assert
         self.assertEqual(self.mrtd.decoded_mrz, decoded_mrz, 'decoded mrz for provided encoded string is correct')
 
+    """
+    test decode_many returns one fresh dict per record matching decode_mrz_input
+    """
+    def test_decode_many_returns_fresh_dict_per_record(self):
+        # assemble
+        with open('resources/encoded_3.json', 'r') as file:
+            encoded_mrzs = json.load(file).get('records_encoded')
+        with open('resources/decoded_3.json', 'r') as file:
+            decoded_records = json.load(file).get('records_decoded')
+        # act
+        results = self.mrtd.decode_many(encoded_mrzs)
+        # assert
+        self.assertEqual(len(results), 3)
+        self.assertIsNot(results[0], results[1])
+        for result, decoded in zip(results, decoded_records):
+            self.assertEqual(result['last_name'], decoded['line1']['last_name'])
+            self.assertEqual(result['given_name'], decoded['line1']['given_name'])
+            self.assertEqual(result['personal_number'], decoded['line2']['personal_number'])
+        self.assertEqual(results[0], MachineReadableTravelDocument().decode_mrz_input(encoded_mrzs[0]))
+
+    """
+    test decode_many raises exception when a record does not match the fixed layout
+    """
+    def test_decode_many_raises_exception_when_record_malformed(self):
+        with self.assertRaises(Exception):
+            self.mrtd.decode_many(["P<CIVLYNN<<NEVEAH<BRAM;W620126G54CIV"])
+
+    """
+    test encode_many returns the same MRZ strings as encode_mrz_input for every record
+    """
+    def test_encode_many_matches_encode_mrz_input(self):
+        # assemble
+        with open('resources/decoded_3.json', 'r') as file:
+            decoded_records = json.load(file).get('records_decoded')
+        with open('resources/encoded_3.json', 'r') as file:
+            encoded_mrzs = json.load(file).get('records_encoded')
+        # act
+        results = self.mrtd.encode_many(decoded_records)
+        # assert
+        self.assertEqual(results, encoded_mrzs)
+        self.assertEqual(results, [self.mrtd.encode_mrz_input(decoded) for decoded in decoded_records])
+
+    """
+    test encode_many raises the encode_mrz_input error when a record in the batch is missing a field
+    """
+    def test_encode_many_raises_exception_when_field_missing(self):
+        with open('resources/decoded_3.json', 'r') as file:
+            decoded_records = json.load(file).get('records_decoded')
+        del decoded_records[2]['line2']['sex']
+        with self.assertRaises(Exception) as err:
+            self.mrtd.encode_many(decoded_records)
+        self.assertIn("'sex'", str(err.exception))
+
+    """
+    test the columnar encode_many pads short fields to their column like the TD3 layout and
+    rejects a field too long for its column
+    """
+    def test_encode_many_pads_short_fields_and_rejects_long_fields(self):
+        with open('resources/decoded_3.json', 'r') as file:
+            decoded_records = json.load(file).get('records_decoded')
+        decoded_records[0]['line2']['passport_number'] = 'L8989'
+        decoded_records[1]['line2']['personal_number'] = ''
+        decoded_records[2]['line1']['given_name'] = ''
+        encoded_mrzs = self.mrtd.encode_many(decoded_records)
+        self.assertEqual(encoded_mrzs[0][45:55], 'L8989<<<<3')
+        self.assertEqual(encoded_mrzs, self.mrtd.encode_many(decoded_records, layout='TD3'))
+        decoded_records[1]['line2']['passport_number'] = 'L898902C3X'
+        with self.assertRaises(Exception) as err:
+            self.mrtd.encode_many(decoded_records)
+        self.assertIn("'passport_number' does not fit", str(err.exception))
+
+    """
+    test an over-long name is truncated to the names field by encode_mrz_input, encode_many and
+    the TD3 layout alike, and the record decodes
+    """
+    def test_encode_paths_truncate_long_names_alike(self):
+        # assemble
+        with open('resources/decoded_3.json', 'r') as file:
+            decoded_input = json.load(file).get('records_decoded')[0]
+        decoded_input['line1']['given_name'] = 'NEVEAH BRAM ' + 'X' * 40
+        # act
+        encoded_mrz = self.mrtd.encode_mrz_input(decoded_input)
+        # assert
+        self.assertEqual(len(encoded_mrz), 89)
+        self.assertEqual(encoded_mrz[:45], 'P<CIVLYNN<<NEVEAH<BRAM<' + 'X' * 21 + ';')
+        self.assertEqual(self.mrtd.encode_many([decoded_input]), [encoded_mrz])
+        self.assertEqual(self.mrtd.encode_many([decoded_input], layout='TD3'), [encoded_mrz])
+        self.assertEqual(self.mrtd.decode(encoded_mrz)['personal_number'], 'AJ010215I')
+
+    """
+    test a record without personal number, '<' standing in for its check digit, is accepted by
+    every TD3 decoder and validator
+    """
+    def test_decode_paths_accept_filler_personal_number_check_digit(self):
+        # assemble
+        with open('resources/decoded_3.json', 'r') as file:
+            decoded_input = json.load(file).get('records_decoded')[0]
+        decoded_input['line2']['personal_number'] = None
+        # act
+        encoded_mrz = self.mrtd.encode_mrz_input(decoded_input)
+        decoded = self.mrtd.decode(encoded_mrz)
+        # assert
+        self.assertTrue(encoded_mrz.endswith('<' * 16))
+        self.assertEqual(self.mrtd.encode_many([decoded_input], layout='TD3'), [encoded_mrz])
+        self.assertEqual(decoded['personal_number'], '')
+        self.assertEqual(self.mrtd.decode_many([encoded_mrz]), [decoded])
+        self.assertEqual(self.mrtd.decode_many([encoded_mrz], layout='TD3'), [decoded])
+        self.assertEqual(LazyMRZRecord(encoded_mrz).to_dict(), decoded)
+        self.assertTrue(self.mrtd.validate_mrz_input(encoded_mrz).valid)
+        self.assertEqual(prevalidate_mrz(encoded_mrz), ())
+        self.assertEqual(decode_columnar(pack_mrz_records([encoded_mrz])).failed, b'\x00')
+        # '<' is only a check digit for the optional personal number
+        self.assertFalse(self.mrtd.validate_mrz_input(encoded_mrz[:54] + '<' + encoded_mrz[55:]).valid)
+
+    """
+    test generate_check_digits returns the same digits as generate_check_digit for mixed field lengths
+    """
+    def test_generate_check_digits_matches_generate_check_digit(self):
+        fields = ['L898902C3', '740812', 'AJ010215I', 'ZE184226B', 'A' * 40, '']
+        self.assertEqual(generate_check_digits(fields), ''.join(str(self.mrtd.generate_check_digit(field)) for field in fields))
+        # every position weighs 9 except one making the lane 9 after the first reduction, so the next
+        # positions push it to the maximum a one-byte lane can reach before the following reduction
+        worst_case = '739' * 9 + '8' + '397' * 9 + '3'
+        long_fields = [worst_case, 'A' * 56, 'Z' * 62, '9' * 81, 'Z9' * 40]
+        self.assertEqual(generate_check_digits(long_fields), ''.join(str(compute_check_digit(field)) for field in long_fields))
+        with self.assertRaises(Exception):
+            generate_check_digits(['420;69.1'])
+
+    """
+    test compute_check_digit returns the ICAO check digit for fixed and generic field lengths
+    """
+    def test_compute_check_digit_returns_correct_digit_for_each_field_length(self):
+        self.assertEqual(compute_check_digit('L898902C3'), 6)
+        self.assertEqual(compute_check_digit('740812'), 2)
+        self.assertEqual(compute_check_digit('ZE184226B'), 1)
+        self.assertEqual(compute_check_digit('AJ010215I<<<<<<'), compute_check_digit('AJ010215I'))
+        self.assertEqual(compute_check_digit(''), 0)
+
+    """
+    test compute_check_digit raises the ICAO character exception for illegal and non-ascii characters
+    """
+    def test_compute_check_digit_raises_exception_when_illegal_character_in_field(self):
+        for field in ('420;69.1', 'l898902c3', 'L8989\u00c9C3'):
+            with self.assertRaises(Exception) as ex:
+                compute_check_digit(field)
+            self.assertIn('does not conform to the ICAO standard', str(ex.exception))
+
+    """
+    test the character map is shared by every instance instead of rebuilt per construction
+    """
+    def test_mrtd_instances_share_character_map(self):
+        self.assertIs(self.mrtd.cmap, MachineReadableTravelDocument().cmap)
+
+    """
+    test decode_stream yields the same records as decode_many when the JSON file is read in small chunks
+    """
+    def test_decode_stream_matches_decode_many_for_json_file(self):
+        # assemble
+        with open('resources/records_encoded.json', 'r') as file:
+            encoded_mrzs = json.load(file).get('records_encoded')[:200]
+        # act
+        streamed = self.mrtd.decode_stream('resources/records_encoded.json', chunk_size=50)
+        # assert
+        self.assertEqual([next(streamed) for _ in range(200)], self.mrtd.decode_many(encoded_mrzs))
+
+    """
+    test iter_mrz_records reads newline-delimited text and JSON Lines from text and binary streams
+    """
+    def test_iter_mrz_records_reads_text_and_json_lines(self):
+        with open('resources/encoded_3.json', 'r') as file:
+            encoded_mrzs = json.load(file).get('records_encoded')
+        text = io.StringIO('\n'.join(encoded_mrzs) + '\n\n')
+        json_lines = io.BytesIO('\n'.join(json.dumps(encoded_mrz) for encoded_mrz in encoded_mrzs).encode('utf-8'))
+        self.assertEqual(list(iter_mrz_records(text, chunk_size=16)), encoded_mrzs)
+        self.assertEqual(list(iter_mrz_records(json_lines, chunk_size=16)), encoded_mrzs)
+
+    """
+    test iter_mrz_records raises exception when the JSON document ends inside the records array
+    """
+    def test_iter_mrz_records_raises_exception_when_json_truncated(self):
+        truncated = io.StringIO('{"records_encoded": ["P<CIVLYNN<<NEVEAH<BRAM<<<<<<<<<<<<<<<<<<<<<<;W620126G54')
+        with self.assertRaises(Exception):
+            list(iter_mrz_records(truncated))
+
+    """
+    test iter_mrz_records raises exception at the offset of a corrupt value instead of buffering the rest of the input
+    """
+    def test_iter_mrz_records_raises_exception_at_corrupt_value(self):
+        with open('resources/encoded_3.json', 'r') as file:
+            encoded_mrzs = json.load(file).get('records_encoded')
+        document = '{"records_encoded": [' + json.dumps(encoded_mrzs[0]) + ', garbage, ' + json.dumps(encoded_mrzs[1]) * 50 + ']}'
+        records = iter_mrz_records(io.StringIO(document), chunk_size=16)
+        self.assertEqual(next(records), encoded_mrzs[0])
+        with self.assertRaisesRegex(Exception, 'at offset {}'.format(document.index('garbage'))):
+            next(records)
+
+    """
+    test validate_mrz_input flags each failing check digit without printing
+    """
+    def test_validate_mrz_input_returns_bitmask_of_failed_fields(self):
+        # assemble
+        valid = "P<CIVLYNN<<NEVEAH<BRAM<<<<<<<<<<<<<<<<<<<<<<;W620126G54CIV5910106F9707302AJ010215I<<<<<<6"
+        invalid = "P<CIVLYNN<<NEVEAH<BRAM<<<<<<<<<<<<<<<<<<<<<<;W620126G54CIV5910107F9707302AJ010215I<<<<<<5"
+        output = io.StringIO()
+        # act
+        with contextlib.redirect_stdout(output):
+            valid_result = self.mrtd.validate_mrz_input(valid)
+            invalid_result = self.mrtd.validate_mrz_input(invalid)
+        # assert
+        self.assertTrue(valid_result.valid)
+        self.assertEqual(invalid_result.failed, BIRTH_DATE_INVALID | PERSONAL_NUMBER_INVALID)
+        self.assertEqual(invalid_result.failed_fields, ['birth_date', 'personal_number'])
+        self.assertEqual(output.getvalue(), '')
+
+    """
+    test validate_many counts valid, invalid and malformed records in the summary
+    """
+    def test_validate_many_returns_summary_counters(self):
+        # assemble
+        with open('resources/encoded_3.json', 'r') as file:
+            encoded_mrzs = json.load(file).get('records_encoded')
+        encoded_mrzs.append(encoded_mrzs[0][:-1] + '0')
+        encoded_mrzs.append('P<CIVLYNN')
+        # act
+        results, summary = self.mrtd.validate_many(encoded_mrzs)
+        # assert
+        self.assertEqual([result.failed for result in results], [0, 0, 0, PERSONAL_NUMBER_INVALID, MALFORMED_INPUT])
+        self.assertEqual(summary.total, 5)
+        self.assertEqual(summary.valid, 3)
+        self.assertEqual(summary.field_failures['personal_number'], 1)
+        self.assertEqual(summary.field_failures['malformed'], 1)
+        self.assertAlmostEqual(summary.error_rate, 0.4)
+
+    """
+    test decode_mrz_input returns an MRZRecord that converts back to the decoded dict
+    """
+    def test_decode_mrz_input_returns_record_when_requested(self):
+        # assemble
+        encoded_mrz = "P<CIVLYNN<<NEVEAH<BRAM<<<<<<<<<<<<<<<<<<<<<<;W620126G54CIV5910106F9707302AJ010215I<<<<<<6"
+        # act
+        record = self.mrtd.decode_mrz_input(encoded_mrz, as_record=True)
+        # assert
+        self.assertIsInstance(record, MRZRecord)
+        self.assertEqual(record.passport_number, 'W620126G5')
+        self.assertEqual(record.to_dict(), MachineReadableTravelDocument().decode_mrz_input(encoded_mrz))
+        self.assertEqual(self.mrtd.decode_many([encoded_mrz], as_record=True), [record])
+
+    """
+    test encode_mrz_input and encode_many accept MRZRecord and the encode payload round-trips
+    """
+    def test_encode_mrz_input_accepts_record(self):
+        # assemble
+        with open('resources/decoded_3.json', 'r') as file:
+            decoded_input = json.load(file).get('records_decoded')[0]
+        record = MRZRecord.from_encode_dict(decoded_input)
+        # act
+        encoded = self.mrtd.encode_mrz_input(record)
+        # assert
+        self.assertEqual(record.to_encode_dict(), decoded_input)
+        self.assertEqual(encoded, "P<CIVLYNN<<NEVEAH<BRAM<<<<<<<<<<<<<<<<<<<<<<;W620126G54CIV5910106F9707302AJ010215I<<<<<<6")
+        self.assertEqual(self.mrtd.encode_many([record]), [encoded])
+
+    """
+    test a record without personal number keeps it as None in the encode payload and encodes it as filler
+    """
+    def test_encode_mrz_input_accepts_record_without_personal_number(self):
+        # assemble
+        with open('resources/decoded_3.json', 'r') as file:
+            decoded_input = json.load(file).get('records_decoded')[0]
+        record = MRZRecord.from_encode_dict(decoded_input)._replace(personal_number=None)
+        # act
+        encoded = self.mrtd.encode_mrz_input(record)
+        # assert
+        self.assertIsNone(record.to_encode_dict()["line2"]["personal_number"])
+        self.assertEqual(encoded, "P<CIVLYNN<<NEVEAH<BRAM<<<<<<<<<<<<<<<<<<<<<<;W620126G54CIV5910106F9707302<<<<<<<<<<<<<<<<")
+        self.assertEqual(self.mrtd.encode_many([record]), [encoded])
+
+    """
+    test encode_mrz_input raises the missing field exception for a record without line 2 fields
+    """
+    def test_encode_mrz_input_raises_exception_when_record_incomplete(self):
+        record = MRZRecord(issuing_country='CIV', last_name='LYNN', given_name='NEVEAH BRAM')
+        with self.assertRaises(Exception) as err:
+            self.mrtd.encode_mrz_input(record)
+        self.assertIn("'passport_number'", str(err.exception))
+
+    """
+    test decode_columnar fills fixed-width field columns and flags failing check digits per record
+    """
+    def test_decode_columnar_returns_columns_and_failed_flags(self):
+        # assemble
+        with open('resources/encoded_3.json', 'r') as file:
+            encoded_mrzs = json.load(file).get('records_encoded')
+        encoded_mrzs.append(encoded_mrzs[0][:64] + '7' + encoded_mrzs[0][65:])
+        # act
+        columns = decode_columnar(pack_mrz_records(encoded_mrzs))
+        # assert
+        self.assertEqual(len(columns), 4)
+        self.assertEqual(columns.columns['country_code'], b'CIVREUCRICIV')
+        self.assertEqual(columns.value('expiration_date', 1), b'690413')
+        self.assertEqual(list(columns.failed), [0, 0, 0, BIRTH_DATE_INVALID])
+        self.assertEqual(columns.valid_count, 3)
+        self.assertEqual(list(columns.failed), [result.failed for result in self.mrtd.validate_many(encoded_mrzs)[0]])
+
+    """
+    test pack_mrz_records and decode_columnar reject records and buffers of the wrong length
+    """
+    def test_decode_columnar_raises_exception_when_buffer_length_invalid(self):
+        with self.assertRaises(Exception):
+            pack_mrz_records(["P<CIVLYNN<<NEVEAH<BRAM"])
+        with self.assertRaises(Exception):
+            decode_columnar(b'P' * 100)
+
+    """
+    test convert_json_to_archive writes fixed-width records that MRZArchive reads back by index
+    """
+    def test_mrz_archive_round_trips_encoded_records(self):
+        # assemble
+        with open('resources/encoded_3.json', 'r') as file:
+            encoded_mrzs = json.load(file).get('records_encoded')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'records.mrza')
+            # act
+            written = convert_json_to_archive('resources/encoded_3.json', path, batch_size=2)
+            with MRZArchive(path) as archive:
+                # assert
+                self.assertEqual(written, 3)
+                self.assertEqual(os.path.getsize(path), 16 + 3 * 88)
+                self.assertEqual(len(archive), 3)
+                self.assertEqual(archive[1], encoded_mrzs[1])
+                self.assertEqual(archive[-1], encoded_mrzs[2])
+                self.assertEqual(bytes(archive.record(0)), encoded_mrzs[0].replace(';', '').encode('ascii'))
+                self.assertEqual(archive.decode_many(1), self.mrtd.decode_many(encoded_mrzs[1:]))
+                self.assertEqual(archive.decode_columnar().columns['passport_number'], b'W620126G5Q683170H1D553838Y2')
+                with self.assertRaises(IndexError):
+                    archive.record(3)
+
+    """
+    test MRZArchive raises exception for a file without the archive header and the writer rejects unseparated lines
+    """
+    def test_mrz_archive_raises_exception_when_file_invalid(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'records.mrza')
+            with open(path, 'wb') as file:
+                file.write(b'{"records_encoded": []}')
+            with self.assertRaises(Exception):
+                MRZArchive(path)
+            with MRZArchiveWriter(path) as writer:
+                with self.assertRaises(Exception):
+                    writer.write('P' * 89)
+
+    """
+    test MRZArchive rejects an empty file and one shorter than the header without leaking the file
+    """
+    def test_mrz_archive_raises_exception_when_file_shorter_than_header(self):
+        opened = []
+        def tracking_open(*args, **kwargs):
+            opened.append(open(*args, **kwargs))
+            return opened[-1]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'records.mrza')
+            for content in (b'', b'MRZA\x01'):
+                with open(path, 'wb') as file:
+                    file.write(content)
+                with patch('MRTD.open', tracking_open, create=True):
+                    with self.assertRaises(Exception) as err:
+                        MRZArchive(path)
+                self.assertEqual(str(err.exception), "The file provided is not a version 1 MRZ archive")
+                self.assertTrue(opened[-1].closed)
+
+    """
+    test prevalidate_mrz accepts a sample record and explains each structural problem of a garbage read
+    """
+    def test_prevalidate_mrz_reports_reasons(self):
+        # assemble
+        with open('resources/encoded_3.json', 'r') as file:
+            encoded_mrz = json.load(file).get('records_encoded')[0]
+        garbage = encoded_mrz[:10] + '#' + encoded_mrz[11:44] + '\n' + encoded_mrz[45:54] + 'X' + encoded_mrz[55:]
+        # act / assert
+        self.assertEqual(prevalidate_mrz(encoded_mrz), ())
+        self.assertEqual(prevalidate_mrz(garbage), (
+            "illegal character '#' at position 10 (names)",
+            "illegal character '\\n' at position 44 (separator)",
+            "expected a digit at position 54 (passport_check_digit), got 'X'"
+        ))
+        self.assertEqual(prevalidate_mrz(encoded_mrz[:60]), ("expected 89 characters, got 60",))
+        self.assertEqual(prevalidate_mrz(encoded_mrz[:65] + 'Q' + encoded_mrz[66:]),
+                         ("expected M, F or X or '<' at position 65 (sex), got 'Q'",))
+        # '<' is a filler, allowed for an unspecified sex but not as the document type
+        self.assertEqual(prevalidate_mrz(encoded_mrz[:65] + '<' + encoded_mrz[66:]), ())
+        self.assertEqual(prevalidate_mrz('<' + encoded_mrz[1:]), ("expected a letter at position 0 (document_type), got '<'",))
+
+    """
+    test partition_mrz_inputs keeps well-formed records in order and reports the malformed ones by index
+    """
+    def test_partition_mrz_inputs_splits_batch(self):
+        # assemble
+        with open('resources/records_encoded.json', 'r') as file:
+            encoded_mrzs = json.load(file).get('records_encoded')[:300]
+        batch = encoded_mrzs[:150] + ['P<CIVLYNN<<NEVEAH<BRAM', encoded_mrzs[0].replace(';', '|')] + encoded_mrzs[150:]
+        # act
+        valid, invalid = partition_mrz_inputs(batch, chunk_size=64)
+        # assert
+        self.assertEqual(valid, encoded_mrzs)
+        self.assertEqual([(index, reasons) for index, _, reasons in invalid],
+                         [(150, ("expected 89 characters, got 22",)), (151, ("illegal character '|' at position 44 (separator)",))])
+        self.assertEqual(self.mrtd.decode_many(valid), self.mrtd.decode_many(encoded_mrzs))
+
+    """
+    test the TD3 layout spec decodes and encodes the sample records exactly like the TD3 codec
+    """
+    def test_td3_layout_matches_td3_codec(self):
+        # assemble
+        with open('resources/records_encoded.json', 'r') as file:
+            encoded_mrzs = json.load(file).get('records_encoded')[:500]
+        encoded_mrzs[7] = encoded_mrzs[7][:54] + str((int(encoded_mrzs[7][54]) + 1) % 10) + encoded_mrzs[7][55:]
+        # act
+        decoded = self.mrtd.decode_many(encoded_mrzs, layout='TD3')
+        payloads = [record.to_encode_dict() for record in self.mrtd.decode_many(encoded_mrzs, as_record=True, layout=TD3_LAYOUT)
+                    if record.passport_number is not None]
+        # assert
+        self.assertEqual(decoded, self.mrtd.decode_many(encoded_mrzs))
+        self.assertNotIn('passport_number', decoded[7])
+        self.assertEqual(self.mrtd.encode_many(payloads, layout='TD3'), self.mrtd.encode_many(payloads))
+        with self.assertRaises(Exception):
+            self.mrtd.decode_many([encoded_mrzs[0][:88]], layout='TD3')
+
+    """
+    test the TD1 and TD2 layouts decode the ICAO 9303 specimens, verify the composite check digit and encode them back
+    """
+    def test_td1_td2_layouts_round_trip_specimens(self):
+        # assemble
+        specimens = (
+            (TD1_LAYOUT, 'I<UTOD231458907<<<<<<<<<<<<<<<;7408122F1204159UTO<<<<<<<<<<<6;ERIKSSON<<ANNA<MARIA<<<<<<<<<<'),
+            (TD2_LAYOUT, 'I<UTOERIKSSON<<ANNA<MARIA<<<<<<<<<<<;D231458907UTO7408122F1204159<<<<<<<6')
+        )
+        for layout, encoded_mrz in specimens:
+            composite = layout.check_digits[-1][1] * (layout.line_length + 1) + layout.check_digits[-1][2]
+            corrupted = encoded_mrz[:composite] + '0' + encoded_mrz[composite + 1:]
+            # act
+            decoded, rejected = self.mrtd.decode_many([encoded_mrz, corrupted], layout=layout.name)
+            payload = {"line1": {field: decoded[field] for field in ('document_type', 'issuing_country', 'last_name', 'given_name')},
+                       "line2": {field: decoded[field] for field in ('document_number', 'country_code', 'birth_date', 'sex', 'expiration_date')}}
+            # assert
+            self.assertEqual(decoded['document_number'], 'D23145890')
+            self.assertEqual((decoded['birth_date'], decoded['sex'], decoded['expiration_date']), ('740812', 'F', '120415'))
+            self.assertEqual((decoded['last_name'], decoded['given_name']), ('ERIKSSON', 'ANNA MARIA'))
+            self.assertEqual(rejected, {'document_type': 'I', 'issuing_country': 'UTO', 'last_name': 'ERIKSSON', 'given_name': 'ANNA MARIA'})
+            self.assertEqual(self.mrtd.encode_many([payload], layout=layout), [encoded_mrz])
+
+    """
+    test LazyMRZRecord decodes each field on first access and materializes the same dict as decode_many
+    """
+    def test_lazy_record_decodes_fields_on_access(self):
+        # assemble
+        with open('resources/records_encoded.json', 'r') as file:
+            encoded_mrzs = json.load(file).get('records_encoded')[:200]
+        corrupted = encoded_mrzs[0][:54] + str((int(encoded_mrzs[0][54]) + 1) % 10) + encoded_mrzs[0][55:]
+        # act
+        records = [LazyMRZRecord(encoded_mrz) for encoded_mrz in encoded_mrzs + [corrupted]]
+        lazy = records[-1]
+        expiration_date = lazy.expiration_date
+        # assert
+        self.assertEqual(lazy._values, {'expiration_date': expiration_date})
+        self.assertEqual(expiration_date, '970730')
+        self.assertIsNone(lazy.passport_number)
+        self.assertFalse(lazy.valid)
+        self.assertEqual(lazy.get('passport_number', 'n/a'), 'n/a')
+        with self.assertRaises(KeyError):
+            lazy['passport_number']
+        self.assertEqual([record.to_dict() for record in records], self.mrtd.decode_many(encoded_mrzs + [corrupted]))
+        with self.assertRaises(AttributeError):
+            lazy.middle_name
+        with self.assertRaises(Exception):
+            LazyMRZRecord(encoded_mrzs[0][:88])
+        # a non-digit check digit is malformed for decode_many but only fails its own field lazily
+        malformed = encoded_mrzs[0][:54] + 'X' + encoded_mrzs[0][55:]
+        with self.assertRaises(Exception):
+            self.mrtd.decode_many([malformed])
+        self.assertEqual(LazyMRZRecord(malformed).to_dict(), {field: records[0][field] for field in
+                         ('document_type', 'issuing_country', 'last_name', 'given_name')})
+
+    """
+    test decode_many with a field projection returns only the requested fields that pass their own check digit
+    """
+    def test_decode_many_projects_fields(self):
+        # assemble
+        with open('resources/encoded_3.json', 'r') as file:
+            encoded_mrzs = json.load(file).get('records_encoded')
+        encoded_mrzs[1] = encoded_mrzs[1][:54] + '0' + encoded_mrzs[1][55:]
+        # act
+        projected = self.mrtd.decode_many(encoded_mrzs, fields=['passport_number', 'expiration_date'])
+        # assert
+        self.assertEqual(projected, [
+            {'passport_number': 'W620126G5', 'expiration_date': '970730'},
+            {'expiration_date': '690413'},
+            {'passport_number': 'D553838Y2', 'expiration_date': '011114'}
+        ])
+        with self.assertRaises(Exception):
+            self.mrtd.decode_many(encoded_mrzs, fields=['middle_name'])
+
 if __name__ == '__main__':
     print('Running unit tests for MachineReadableTravelDocument')
     unittest.main(exit=False, verbosity=2)
@@ -1,80 +1,369 @@
+import os
+import sys
 import json
-import unittest
-import csv
-from MRTD import MachineReadableTravelDocument
 import time
-from MRTDTest import TestMachineReadableTravelDocument
+import random
+import string
+import argparse
+import platform
+import tracemalloc
+from operator import itemgetter
+from CharacterMap import CharacterMap
+from MRTD import MachineReadableTravelDocument, MRZRecord, compute_check_digit, generate_check_digits
+from MRTD import LINE_1_FIELDS, LINE_2_FIELDS
+from MRTD import decode_columnar, pack_mrz_records
+from MRTDParallel import ParallelMRTDExecutor, ThreadedMRTDExecutor
+from MRTDStore import MRZStore
 
-if __name__ == '__main__':
+DEFAULT_SIZES = (100, 1000, 10000, 100000)
+DEFAULT_WARMUP = 1
+DEFAULT_REPEAT = 7
+# tail latencies are taken over one timed pass of each benchmark split into this many chunks,
+# since a p95/p99 over a handful of whole-batch repeats is just their slowest run
+LATENCY_CHUNKS = 100
+# a benchmark slower than the baseline median by more than this ratio, plus the run-to-run
+# noise of both runs, is reported as a regression
+REGRESSION_THRESHOLD = 1.10
+
+COUNTRIES = ("CIV", "REU", "CRI", "TON", "ABW", "BMU", "UTO", "D<<", "GBR", "CAN", "IND", "PAK")
+LAST_NAMES = ("LYNN", "MCFARLAND", "VEGA", "PATRICK", "MALDONADO", "SUMMERS", "ERIKSSON", "OKAFOR", "NGUYEN")
+GIVEN_NAMES = ("NEVEAH", "BRAM", "TRINITY", "AMITY", "ELSIE", "TAVIAN", "PRESLEY", "ALICE", "CAMILLA", "JOYCE", "RHETT")
+
+"""
+Synthetic record generator producing encode_mrz_input payloads; the same seed always
+yields the same records, so results stay comparable between runs
+"""
+def generate_decoded_records(count: int, seed: int = 0) -> list:
+    generator = random.Random(seed)
+    alphanumerics = string.ascii_uppercase + string.digits
+
+    def date() -> str:
+        return "{:02d}{:02d}{:02d}".format(generator.randrange(100), generator.randrange(1, 13), generator.randrange(1, 29))
+
+    return [
+        {
+            "line1": {
+                "issuing_country": generator.choice(COUNTRIES),
+                "last_name": generator.choice(LAST_NAMES),
+                "given_name": " ".join(generator.sample(GIVEN_NAMES, generator.randrange(1, 3)))
+            },
+            "line2": {
+                "passport_number": "".join(generator.choices(alphanumerics, k=9)),
+                "country_code": generator.choice(COUNTRIES),
+                "birth_date": date(),
+                "sex": generator.choice("MF"),
+                "expiration_date": date(),
+                "personal_number": "".join(generator.choices(alphanumerics, k=9))
+            }
+        }
+        for _ in range(count)
+    ]
+
+"""
+Synthetic encoded MRZ strings matching generate_decoded_records
+"""
+def generate_encoded_records(count: int, seed: int = 0) -> list:
+    return MachineReadableTravelDocument().encode_many(generate_decoded_records(count, seed))
+
+"""
+helper function to time fn with perf_counter_ns after warmup runs
+@return list of repeat durations in nanoseconds
+"""
+def measure(fn, warmup: int = DEFAULT_WARMUP, repeat: int = DEFAULT_REPEAT) -> list:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        fn()
+        samples.append(time.perf_counter_ns() - start)
+    return samples
+
+"""
+helper function for the nearest-rank percentile of sorted samples
+"""
+def percentile(ordered: list, percent: float) -> int:
+    rank = max(1, -(-percent * len(ordered) // 100))
+    return ordered[min(len(ordered), int(rank)) - 1]
+
+"""
+helper function to time one call of each fn, e.g. one per chunk of a batch
+@return list of durations in nanoseconds, one per fn
+"""
+def measure_each(fns: list) -> list:
+    samples = []
+    for fn in fns:
+        start = time.perf_counter_ns()
+        fn()
+        samples.append(time.perf_counter_ns() - start)
+    return samples
+
+"""
+helper function to summarise the repeat samples of one benchmark run over records items;
+noise is the relative distance of the median from the fastest repeat, and the p50/p95/p99
+tails are taken over the per-chunk latencies when given
+"""
+def summarize(samples: list, records: int, chunk_samples: list = None, chunk_size: int = None) -> dict:
+    ordered = sorted(samples)
+    median = percentile(ordered, 50)
+    summary = {
+        "repeat": len(samples),
+        "median_ns": median,
+        "min_ns": ordered[0],
+        "noise": (median - ordered[0]) / median if median else 0.0,
+        "records_per_sec": records / (median / 1e9) if median else None
+    }
+    if chunk_samples:
+        ordered_chunks = sorted(chunk_samples)
+        summary.update({"chunk_size": chunk_size, "chunks": len(chunk_samples), "chunk_p50_ns": percentile(ordered_chunks, 50),
+                        "chunk_p95_ns": percentile(ordered_chunks, 95), "chunk_p99_ns": percentile(ordered_chunks, 99)})
+    return summary
+
+"""
+Benchmarks of the MRTD hot paths; each entry builds its inputs for a size outside the
+timed region and returns the callable that is timed
+"""
+def build_benchmarks(decoded: list, encoded: list) -> dict:
     mrtd = MachineReadableTravelDocument()
-    mrtdTest = TestMachineReadableTravelDocument()
-    noOfLines = 10000
-    
-    """
-    1. Measure performance time for DECODE with unit tests
-    """
-    with open('resources/records_encoded.json', 'r') as file:
-        d = json.load(file)
-    start_time = time.time()
-    x = d.get('records_encoded')
-    itr = x[:noOfLines]
-    for index, val in enumerate(itr):
-        mrtd.decode_mrz_input(val)
-
-    unittest.main(exit = False)
-    print("--- %s seconds ---" % (time.time() - start_time))
-    encwounit = time.time() - start_time
+    passport_numbers = [record['line2']['passport_number'] for record in decoded]
+    packed = pack_mrz_records(encoded)
+    return {
+        "decode_mrz_input": lambda: [mrtd.decode_mrz_input(encoded_mrz) for encoded_mrz in encoded],
+        "decode_many": lambda: mrtd.decode_many(encoded),
+        "decode_projection": lambda: mrtd.decode_many(encoded, fields=["passport_number", "expiration_date"]),
+        "decode_columnar": lambda: decode_columnar(packed),
+        "validate_many": lambda: mrtd.validate_many(encoded),
+        "encode_mrz_input": lambda: [mrtd.encode_mrz_input(decoded_mrz) for decoded_mrz in decoded],
+        "encode_many": lambda: mrtd.encode_many(decoded),
+        "generate_check_digit": lambda: [mrtd.generate_check_digit(field) for field in passport_numbers],
+        "generate_check_digits": lambda: generate_check_digits(passport_numbers)
+    }
 
-    """
-    2. Measure performance time for DECODE without unit tests
-    """
-    start_time = time.time()
-    x = d.get('records_encoded')
-    itr = x[:noOfLines]
-    for index, val in enumerate(itr):
-        mrtd.decode_mrz_input(val)
-    print("--- %s seconds ---" % (time.time() - start_time))
-    encunit = time.time() - start_time
+"""
+Method to run every benchmark for every size: the whole batch is timed repeat times for the
+median, then once more split into LATENCY_CHUNKS chunks for the tail latencies
+@return list of result dicts, one per benchmark and size
+"""
+def run_benchmarks(sizes, warmup: int = DEFAULT_WARMUP, repeat: int = DEFAULT_REPEAT, only=None, seed: int = 0) -> list:
+    results = []
+    for size in sizes:
+        decoded = generate_decoded_records(size, seed)
+        encoded = MachineReadableTravelDocument().encode_many(decoded)
+        chunk_size = -(-size // LATENCY_CHUNKS)
+        chunked = [build_benchmarks(decoded[start:start + chunk_size], encoded[start:start + chunk_size])
+                   for start in range(0, size, chunk_size)]
+        for name, fn in build_benchmarks(decoded, encoded).items():
+            if only and name not in only:
+                continue
+            samples = measure(fn, warmup, repeat)
+            chunk_samples = measure_each([benchmarks[name] for benchmarks in chunked])
+            result = {"benchmark": name, "size": size, **summarize(samples, size, chunk_samples, chunk_size)}
+            print("--- {benchmark} x {size}: median {median_ms:.3f} ms (noise {noise:.1%}), {records_per_sec:,.0f} records/sec; "
+                  "per {chunk_size} records p50 {p50_us:.1f} us, p95 {p95_us:.1f} us, p99 {p99_us:.1f} us ---".format(
+                      median_ms=result["median_ns"] / 1e6, p50_us=result["chunk_p50_ns"] / 1e3, p95_us=result["chunk_p95_ns"] / 1e3,
+                      p99_us=result["chunk_p99_ns"] / 1e3, **result))
+            results.append(result)
+    return results
 
-    """
-    3. Measure performance time for ENCODE with unit tests
-    """
-    with open('resources/records_decoded.json', 'r') as file:
-        d = json.load(file)
-    start_time = time.time()
-    x = d.get('records_decoded')
-    itr = x[:noOfLines]
-    for index, val in enumerate(itr):
-        mrtd.encode_mrz_input(val)
-
-    unittest.main(exit = False)
-    print("--- %s seconds ---" % (time.time() - start_time))
-    decwounit = time.time() - start_time
+"""
+original per-character check digit loop, kept as the baseline for benchmark_check_digit
+"""
+def legacy_generate_check_digit(cmap: dict, field: str) -> int:
+    total = 0
+    for index, val in enumerate(field):
+        if val not in cmap:
+            raise Exception('The provided character {} does not conform to the ICAO standard alpha-numeric character values.'.format(val))
+        value = cmap[val]
+        weight = 0
+        if index % 3 == 0:
+            weight = 7
+        elif index % 3 == 1:
+            weight = 3
+        elif index % 3 == 2:
+            weight = 1
+        total += (value * weight)
+    return total % 10
 
-    """
-    4. Measure performance time for ENCODE without unit tests
-    """
-    start_time = time.time()
-    x = d.get('records_decoded')
-    itr = x[:noOfLines]
-    for index, val in enumerate(itr):
-        mrtd.encode_mrz_input(val)
-    print("--- %s seconds ---" % (time.time() - start_time))
-    decunit = time.time() - start_time
+"""
+Micro-benchmark of the table-driven check digit engine against the original loop, per field type
+"""
+def benchmark_check_digit(number: int = 100000, repeat: int = DEFAULT_REPEAT) -> dict:
+    cmap = CharacterMap().character_map
+    fields = {"passport_number": "W620126G5", "birth_date": "591010", "personal_number": "AJ010215I"}
+    results = {}
+    for name, field in fields.items():
+        legacy = summarize(measure(lambda: [legacy_generate_check_digit(cmap, field) for _ in range(number)], repeat=repeat), number)
+        engine = summarize(measure(lambda: [compute_check_digit(field) for _ in range(number)], repeat=repeat), number)
+        results[name] = {"legacy_ns": legacy["median_ns"] / number, "table_ns": engine["median_ns"] / number,
+                         "speedup": legacy["median_ns"] / engine["median_ns"]}
+        print("--- check digit {}: legacy {legacy_ns:.0f} ns, table {table_ns:.0f} ns, {speedup:.1f}x faster ---".format(name, **results[name]))
+    return results
+
+"""
+Ceiling benchmark of the batch encode: the encode_mrz_input loop and encode_many against the
+least work any encoder of these payloads does in Python, reading every field out of the
+payload dicts and joining each field into one column; the loop time over that floor bounds
+the speedup encode_many can reach
+"""
+def benchmark_encode_ceiling(decoded: list, repeat: int = DEFAULT_REPEAT) -> dict:
+    mrtd = MachineReadableTravelDocument()
+
+    def read_fields() -> None:
+        for line, fields in (('line1', LINE_1_FIELDS), ('line2', LINE_2_FIELDS)):
+            lines = list(map(itemgetter(line), decoded))
+            for field in fields:
+                ''.join(map(itemgetter(field), lines))
 
+    timings = {
+        "loop_ns": summarize(measure(lambda: [mrtd.encode_mrz_input(decoded_mrz) for decoded_mrz in decoded], repeat=repeat), len(decoded)),
+        "encode_many_ns": summarize(measure(lambda: mrtd.encode_many(decoded), repeat=repeat), len(decoded)),
+        "floor_ns": summarize(measure(read_fields, repeat=repeat), len(decoded))
+    }
+    result = {name: timing["median_ns"] / len(decoded) for name, timing in timings.items()}
+    result["speedup"] = result["loop_ns"] / result["encode_many_ns"]
+    result["ceiling"] = result["loop_ns"] / result["floor_ns"]
+    print("--- encode {} records: loop {loop_ns:.0f} ns, encode_many {encode_many_ns:.0f} ns, field reads alone {floor_ns:.0f} ns "
+          "per record; {speedup:.1f}x, at most {ceiling:.1f}x ---".format(len(decoded), **result))
+    return result
+
+"""
+Scaling benchmark of the process pool decode for 1..max_workers workers
+"""
+def benchmark_parallel_scaling(encoded_mrzs: list, max_workers: int = None, chunk_size: int = 1000) -> dict:
+    max_workers = max_workers or os.cpu_count() or 1
+    results = {}
+    for workers in range(1, max_workers + 1):
+        with ParallelMRTDExecutor(workers=workers, chunk_size=chunk_size) as executor:
+            result = summarize(measure(lambda: executor.decode(encoded_mrzs), repeat=3), len(encoded_mrzs))
+        results[workers] = result
+        print("--- parallel decode, {} worker(s): median {:.3f} s, {:,.0f} records/sec, {:.2f}x ---".format(
+            workers, result["median_ns"] / 1e9, result["records_per_sec"], results[1]["median_ns"] / result["median_ns"]))
+    return results
+
+class IOBoundMRTD(MachineReadableTravelDocument):
     """
-    Print to CSV files
+    decoder that waits io_latency seconds after each record, standing in for a database
+    write or network hop that releases the GIL
     """
-    with open('csv/encode_{}.csv'.format(noOfLines), 'w') as file:
-        writer = csv.writer(file)
-        rowNumber = 1
-        for i in range(rowNumber):
-            row = [noOfLines, encwounit, encunit]
-            writer.writerow(row)
-
-    with open('csv/decode_{}.csv'.format(noOfLines), 'w') as file:
-        writer = csv.writer(file)
-        rowNumber = 1
-        for i in range(rowNumber):
-            row = [noOfLines, decwounit, decunit]
-            writer.writerow(row)
+    def __init__(self, io_latency: float):
+        super().__init__()
+        self.io_latency = io_latency
+
+    def decode(self, encoded_mrz: str, as_record: bool = False):
+        decoded_mrz = super().decode(encoded_mrz, as_record)
+        time.sleep(self.io_latency)
+        return decoded_mrz
+
+"""
+Scaling benchmark of the thread pool decode over one shared stateless instance, with
+io_latency seconds of simulated I/O per record
+"""
+def benchmark_threaded_scaling(encoded_mrzs: list, worker_counts=(1, 2, 4, 8, 16), io_latency: float = 0.0005, chunk_size: int = 50) -> dict:
+    mrtd = IOBoundMRTD(io_latency)
+    results = {}
+    for workers in worker_counts:
+        with ThreadedMRTDExecutor(workers=workers, chunk_size=chunk_size, mrtd=mrtd) as executor:
+            result = summarize(measure(lambda: executor.decode(encoded_mrzs), repeat=3), len(encoded_mrzs))
+        results[workers] = result
+        print("--- threaded decode, {} worker(s): median {:.3f} s, {:,.0f} records/sec, {:.2f}x ---".format(
+            workers, result["median_ns"] / 1e9, result["records_per_sec"], results[worker_counts[0]]["median_ns"] / result["median_ns"]))
+    return results
+
+"""
+Memory benchmark of holding decoded records as dicts versus MRZRecord tuples; field strings
+are shared between both layouts, so the difference is the per-record container overhead
+"""
+def benchmark_record_memory(encoded_mrzs: list, count: int = 1000000) -> dict:
+    decoded = MachineReadableTravelDocument().decode_many(encoded_mrzs)
+    sizes = {}
+    for label, build in (("dict", dict), ("MRZRecord", MRZRecord.from_dict)):
+        tracemalloc.start()
+        records = [build(decoded[index % len(decoded)]) for index in range(count)]
+        sizes[label] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del records
+    print("--- {} records: dict {:.1f} MB, MRZRecord {:.1f} MB, {:.1f}x smaller ---".format(
+        count, sizes["dict"] / 2**20, sizes["MRZRecord"] / 2**20, sizes["dict"] / sizes["MRZRecord"]))
+    return {"records": count, "dict_bytes": sizes["dict"], "record_bytes": sizes["MRZRecord"]}
+
+"""
+Lookup benchmark of the indexed MRZStore against a linear search over the decoded records
+"""
+def benchmark_store_lookup(encoded_mrzs: list, lookups: int = 1000) -> dict:
+    records = MachineReadableTravelDocument().decode_many(encoded_mrzs)
+    store = MRZStore(records)
+    passport_numbers = [record['passport_number'] for record in records[::max(1, len(records) // lookups)]]
+    linear = summarize(measure(lambda: [[r for r in records if r['passport_number'] == p] for p in passport_numbers], repeat=3), len(passport_numbers))
+    indexed = summarize(measure(lambda: [store.by_passport_number(p) for p in passport_numbers]), len(passport_numbers))
+    print("--- {} passport lookups over {} records: linear {:.4f} s, indexed {:.6f} s, {:.0f}x ---".format(
+        len(passport_numbers), len(records), linear["median_ns"] / 1e9, indexed["median_ns"] / 1e9,
+        linear["median_ns"] / indexed["median_ns"]))
+    return {"lookups": len(passport_numbers), "linear": linear, "indexed": indexed}
+
+"""
+Method to compare the medians of results with a baseline JSON file written by an earlier run;
+the threshold is widened by the noise of both runs, so a noisy small batch is not reported
+as a regression
+@return list of (benchmark, size, ratio) for benchmarks slower than the threshold
+"""
+def compare_results(results: list, baseline_path: str, threshold: float = REGRESSION_THRESHOLD) -> list:
+    with open(baseline_path, 'r') as file:
+        baseline = {(result["benchmark"], result["size"]): result for result in json.load(file)["results"]}
+    regressions = []
+    for result in results:
+        previous = baseline.get((result["benchmark"], result["size"]))
+        if previous is None:
+            continue
+        ratio = result["median_ns"] / previous["median_ns"]
+        allowed = threshold + result.get("noise", 0.0) + previous.get("noise", 0.0)
+        print("--- {} x {}: {:.2f}x of baseline (allowed {:.2f}x){} ---".format(
+            result["benchmark"], result["size"], ratio, allowed, " (REGRESSION)" if ratio > allowed else ""))
+        if ratio > allowed:
+            regressions.append((result["benchmark"], result["size"], ratio))
+    return regressions
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark suite for the MRTD encode/decode paths")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma separated record counts, e.g. 100,1000,1000000")
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--only", help="comma separated benchmark names to run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--extras", action="store_true",
+                        help="also run the check digit, process and thread scaling, memory and store benchmarks")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON results file")
+    parser.add_argument("--compare", help="baseline JSON results file to check for regressions")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    only = set(args.only.split(",")) if args.only else None
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "warmup": args.warmup,
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "results": run_benchmarks(sizes, args.warmup, args.repeat, only, args.seed)
+    }
+    if args.extras:
+        encoded = generate_encoded_records(10000, args.seed)
+        report["extras"] = {
+            "check_digit": benchmark_check_digit(),
+            "encode_ceiling": benchmark_encode_ceiling(generate_decoded_records(10000, args.seed)),
+            "parallel_scaling": benchmark_parallel_scaling(encoded),
+            "threaded_scaling": benchmark_threaded_scaling(encoded[:2000]),
+            "record_memory": benchmark_record_memory(encoded),
+            "store_lookup": benchmark_store_lookup(encoded)
+        }
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print("--- results written to {} ---".format(args.output))
+
+    if args.compare:
+        return 1 if compare_results(report["results"], args.compare) else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())